@@ -0,0 +1,280 @@
+import argparse
+import contextlib
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timezone
+
+import numpy as np
+
+import figures
+
+# Rendering benchmark for every figure of the four lessons.
+# Each case draws one figure with the draw_<name> function of its lesson (see figures.py), on synthetic inputs of n
+# rows in the shape of the lesson's sample data, and is timed in three phases: data preparation (building the inputs),
+# drawing (the lesson function, up to a full canvas draw) and savefig (export.savefig, as the lessons save). Peak
+# memory of each phase is measured in a second, traced run so that tracemalloc does not skew the timings. The caches
+# the lessons fill (bins, triangulations, layouts) point at a fresh temporary directory for every run, so that each
+# timing is a cold render and does not depend on what earlier runs left in .cache. Results are written as JSON;
+# --compare prints the ratios against an earlier run.
+#
+#   python benchmark_figures.py                                   # every case, toy size up to 10**6 rows
+#   python benchmark_figures.py hexbin triangular_color_plot --max-rows 10000000
+#   python benchmark_figures.py --compare benchmark_results_old.json
+
+SIZES = [10 ** e for e in range(2, 8)]
+MAX_ARTISTS = 10_000  # cases that draw one bar/polygon per row stop at this size
+
+CASES = {}
+
+
+def case(name, toy, per_row=False):
+    # Register the inputs of a figure: fn(n, rng) -> the arguments of draw_<name> for n rows
+    def register(fn):
+        if name not in figures.FIGURES:
+            raise ValueError(f'{name!r} is not a lesson figure')
+        CASES[name] = {'inputs': fn, 'toy': toy, 'per_row': per_row}
+        return fn
+    return register
+
+
+# LESSON 1 -------------------------------------------------------------------------------------------------------------
+
+@case('graph_comparison', toy=4, per_row=True)
+def graph_comparison(n, rng):
+    # n quarters of three products
+    return rng.integers(100, 350, (3, n)), [f'Q{i + 1}' for i in range(n)], ['Product A', 'Product B', 'Product C']
+
+
+# LESSON 2 -------------------------------------------------------------------------------------------------------------
+
+@case('us_states_population_map', toy=50, per_row=True)
+def us_states_population_map(n, rng):
+    import geopandas as gpd
+    from shapely.geometry import box
+
+    side = int(np.ceil(np.sqrt(n)))
+    names = [f'State {i}' for i in range(n)]
+    states = gpd.GeoDataFrame({'name': names},
+                              geometry=[box(i % side, i // side, i % side + 0.9, i // side + 0.9) for i in range(n)])
+    return states, dict(zip(names, rng.uniform(0.5, 40, n)))
+
+
+# LESSON 3 -------------------------------------------------------------------------------------------------------------
+
+def _cities(n, rng):
+    return {'City': [f'City {i}' for i in range(n)], 'Population': rng.integers(100_000, 9_000_000, n)}
+
+
+@case('sorting', toy=5, per_row=True)
+def sorting(n, rng):
+    return _cities(n, rng),
+
+
+@case('aggregation', toy=7, per_row=True)
+def aggregation(n, rng):
+    return {'State': [f'State {i}' for i in rng.integers(0, 50, n)], **_cities(n, rng)},
+
+
+@case('filtering', toy=5, per_row=True)
+def filtering(n, rng):
+    return _cities(n, rng),
+
+
+@case('merge', toy=5, per_row=True)
+def merge(n, rng):
+    # The area table lists the cities in another order than the population table
+    cities = _cities(n, rng)
+    order = rng.permutation(n)
+    return cities, {'City': [cities['City'][i] for i in order], 'Area (sq mi)': rng.uniform(50, 700, n)}
+
+
+# LESSON 4 -------------------------------------------------------------------------------------------------------------
+
+@case('lineplot', toy=100)
+def lineplot(n, rng):
+    x = np.linspace(0, 10, n)
+    x2 = np.linspace(0, 10, max(n // 4, 2))
+    return x, 4 + np.sin(2 * x), x2, 4 + np.sin(2 * x2)
+
+
+@case('scatterplot', toy=24)
+def scatterplot(n, rng):
+    return 4 + rng.normal(0, 2, n), 4 + rng.normal(0, 2, n), rng.uniform(15, 80, n), rng.uniform(15, 80, n)
+
+
+def _correlated(n, rng):
+    x = rng.standard_normal(n)
+    return x, 1.2 * x + rng.standard_normal(n) / 3
+
+
+@case('hist2d', toy=5000)
+def hist2d(n, rng):
+    return _correlated(n, rng)
+
+
+@case('stackplot', toy=5)
+def stackplot(n, rng):
+    x = np.linspace(0, 10, n)
+    return x, np.vstack([1 + x / 5, np.ones(n), 1.5 + 0.5 * np.sign(np.sin(x * np.pi / 2))])
+
+
+@case('hexbin', toy=5000)
+def hexbin(n, rng):
+    return _correlated(n, rng)
+
+
+@case('triangular_color_plot', toy=256)
+def triangular_color_plot(n, rng):
+    x = rng.uniform(-3, 3, n)
+    y = rng.uniform(-3, 3, n)
+    return x, y, (1 - x / 2 + x ** 5 + y ** 3) * np.exp(-x ** 2 - y ** 2)
+
+
+@case('monthly_energy_consumption_multiple_households', toy=12)
+def monthly_energy_consumption_multiple_households(n, rng):
+    # n points per household line (12 = one year of months)
+    import pandas as pd
+    data = pd.DataFrame({f'Household {i + 1}': rng.integers(280, 500, n) for i in range(3)})
+    data.insert(0, 'Month', np.arange(n))
+    return data,
+
+
+@case('energy_consumption_vs_temperature', toy=60)
+def energy_consumption_vs_temperature(n, rng):
+    import pandas as pd
+    months = np.tile(np.arange(1, 13), n // 12 + 1)[:n]
+    temperature = rng.uniform(5, 30, size=n)
+    return pd.DataFrame({'Month': months, 'Average Temperature (°C)': temperature,
+                         'Energy Consumption (kWh)': temperature * 15 + rng.normal(0, 10, size=n)}),
+
+
+# HARNESS --------------------------------------------------------------------------------------------------------------
+
+@contextlib.contextmanager
+def _fresh_caches(directory):
+    # Point the caches of the lessons at empty directories under directory, for one run
+    import binning
+    import export
+    import triangulation_cache
+
+    modules = (binning, triangulation_cache, export)
+    saved = [module.CACHE_DIR for module in modules]
+    for module in modules:
+        module.CACHE_DIR = tempfile.mkdtemp(prefix=f'{module.__name__}-', dir=directory)
+    try:
+        yield
+    finally:
+        for module, cache_dir in zip(modules, saved):
+            module.CACHE_DIR = cache_dir
+
+
+def _phases(name, n, traced, output_dir):
+    # Run one case once, with empty caches; returns {phase: seconds} or {phase: peak bytes} when traced
+    import export
+
+    draw = figures.drawing(name)
+    rng = np.random.default_rng(0)
+    results = {}
+
+    def measure(phase, fn, *args):
+        if traced:
+            tracemalloc.reset_peak()
+            before = tracemalloc.get_traced_memory()[0]
+        start = time.perf_counter()
+        value = fn(*args)
+        seconds = time.perf_counter() - start
+        results[phase] = tracemalloc.get_traced_memory()[1] - before if traced else seconds
+        return value
+
+    def draw_and_render(inputs):
+        fig = draw(*inputs)
+        fig.canvas.draw()
+        return fig
+
+    with figures.default_style(), _fresh_caches(output_dir):
+        inputs = measure('prep', CASES[name]['inputs'], n, rng)
+        fig = measure('draw', draw_and_render, inputs)
+        measure('savefig', export.savefig, os.path.join(output_dir, f'{name}.png'), fig)
+    return results
+
+
+def run(names=None, sizes=SIZES, max_rows=10 ** 6, max_artists=MAX_ARTISTS, memory=True, report=print):
+    import matplotlib
+    matplotlib.use('Agg')
+
+    records = []
+    # The saved files and the caches are thrown away
+    with tempfile.TemporaryDirectory(prefix='benchmark-') as output_dir:
+        for name in names or CASES:
+            spec = CASES[name]
+            limit = min(max_rows, max_artists) if spec['per_row'] else max_rows
+            for n in sorted({spec['toy'], *[s for s in sizes if s <= limit]}):
+                timings = _phases(name, n, traced=False, output_dir=output_dir)
+                record = {'case': name, 'rows': n, **{f'{k}_s': v for k, v in timings.items()}}
+                if memory:
+                    tracemalloc.start()
+                    try:
+                        peaks = _phases(name, n, traced=True, output_dir=output_dir)
+                    finally:
+                        tracemalloc.stop()
+                    record.update({f'{k}_peak_bytes': v for k, v in peaks.items()})
+                records.append(record)
+                report(f'{name:<48} {n:>10,} rows  prep {record["prep_s"]:8.3f}s  draw {record["draw_s"]:8.3f}s  '
+                       f'savefig {record["savefig_s"]:8.3f}s'
+                       + (f'  peak {max(peaks.values()) / 1e6:8.1f} MB' if memory else ''))
+    return records
+
+
+def environment():
+    import matplotlib
+    import pandas as pd
+    return {'python': platform.python_version(), 'platform': platform.platform(), 'cpus': os.cpu_count(),
+            'numpy': np.__version__, 'pandas': pd.__version__, 'matplotlib': matplotlib.__version__,
+            'timestamp': datetime.now(timezone.utc).isoformat(timespec='seconds')}
+
+
+def compare(records, baseline, report=print):
+    # Ratio current / baseline of every phase time, for the (case, rows) pairs present in both runs
+    previous = {(r['case'], r['rows']): r for r in baseline['results']}
+    for record in records:
+        old = previous.get((record['case'], record['rows']))
+        if old is None:
+            continue
+        ratios = '  '.join(f'{phase} x{record[f"{phase}_s"] / old[f"{phase}_s"]:.2f}'
+                           for phase in ('prep', 'draw', 'savefig') if old.get(f'{phase}_s'))
+        report(f'{record["case"]:<48} {record["rows"]:>10,} rows  {ratios}')
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark the lesson figures at growing input sizes.')
+    parser.add_argument('cases', nargs='*', help=f'cases to run (default: all of {", ".join(CASES)})')
+    parser.add_argument('--max-rows', type=int, default=10 ** 6, help='largest input size')
+    parser.add_argument('--max-artists', type=int, default=MAX_ARTISTS,
+                        help='largest input size for cases that draw one bar or polygon per row')
+    parser.add_argument('--no-memory', action='store_true', help='skip the traced run that measures peak memory')
+    parser.add_argument('--output', default='benchmark_results.json')
+    parser.add_argument('--compare', help='earlier results file to compare with')
+    args = parser.parse_args(argv)
+
+    unknown = [name for name in args.cases if name not in CASES]
+    if unknown:
+        parser.error(f'unknown case(s): {", ".join(unknown)}')
+
+    records = run(args.cases, max_rows=args.max_rows, max_artists=args.max_artists, memory=not args.no_memory)
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump({'environment': environment(), 'results': records}, f, indent=2)
+    print(f'results written to {args.output}')
+
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            compare(records, json.load(f))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,197 @@
+import hashlib
+import math
+import os
+
+import numpy as np
+
+# 2-D binning shared by the HIST2D and HEXBIN sections of lesson_4.py.
+# Both count grids (rectangular as ax.hist2d, hexagonal as ax.hexbin) are filled in the same pass over the points, or
+# chunk by chunk for inputs that do not fit in memory. The figures are then drawn from the grids, so changing the
+# colormap, the norm or the axis limits never goes back to the raw data. binned() keeps the grids of a dataset in
+# .cache/bins, which lets the two sections of the lesson share one binning run; the directory is kept under MAX_BYTES
+# by evicting the least recently used grids.
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+CACHE_DIR = os.path.join(ROOT, '.cache', 'bins')
+MAX_BYTES = 16 * 1024 * 1024
+
+
+class BinGrids:
+
+    def __init__(self, extent, bins=(30, 30), gridsize=30):
+        xmin, xmax, ymin, ymax = extent
+        self.extent = (xmin, xmax, ymin, ymax)
+        self.bins = tuple(bins) if np.iterable(bins) else (bins, bins)
+        self.gridsize = tuple(gridsize) if np.iterable(gridsize) else (gridsize, int(gridsize / math.sqrt(3)))
+
+        # Rectangular grid, same edges as np.histogram2d(x, y, bins, range=...)
+        self.xedges = np.linspace(xmin, xmax, self.bins[0] + 1)
+        self.yedges = np.linspace(ymin, ymax, self.bins[1] + 1)
+        self.rect = np.zeros(self.bins, dtype=np.int64)
+
+        # Hexagonal grid, same layout as ax.hexbin(x, y, gridsize, extent=...): a (nx + 1) x (ny + 1) lattice of
+        # hexagon centres plus an nx x ny lattice shifted by half a cell
+        nx, ny = self.gridsize
+        padding = 1.e-9 * (xmax - xmin)
+        self.hex_origin = (xmin - padding, ymin)
+        self.hex_size = ((xmax - xmin + 2 * padding) / nx, (ymax - ymin) / ny)
+        self.hex = np.zeros((nx + 1) * (ny + 1) + nx * ny, dtype=np.int64)
+        self.count = 0
+
+    @classmethod
+    def from_points(cls, x, y, bins=(30, 30), gridsize=30):
+        # Extent from the data, as hist2d and hexbin use when no range/extent is given
+        x = np.asarray(x, dtype=float)
+        y = np.asarray(y, dtype=float)
+        if len(x):
+            xmin, xmax, ymin, ymax = x.min(), x.max(), y.min(), y.max()
+        else:
+            xmin, xmax, ymin, ymax = 0.0, 1.0, 0.0, 1.0
+        if xmin == xmax:
+            xmin, xmax = xmin - 0.5, xmax + 0.5
+        if ymin == ymax:
+            ymin, ymax = ymin - 0.5, ymax + 0.5
+        return cls((xmin, xmax, ymin, ymax), bins, gridsize).add(x, y)
+
+    def add(self, x, y):
+        # Accumulate a chunk of points into both grids; points outside the extent are ignored
+        x = np.asarray(x, dtype=float)
+        y = np.asarray(y, dtype=float)
+        self.count += len(x)
+
+        # Rectangular bins: the last bin includes its right edge, as in np.histogramdd
+        bx, by = self.bins
+        ix = np.searchsorted(self.xedges, x, side='right') - 1
+        iy = np.searchsorted(self.yedges, y, side='right') - 1
+        ix[x == self.xedges[-1]] = bx - 1
+        iy[y == self.yedges[-1]] = by - 1
+        inside = (ix >= 0) & (ix < bx) & (iy >= 0) & (iy < by)
+        self.rect += np.bincount(ix[inside] * by + iy[inside], minlength=bx * by).reshape(bx, by)
+
+        # Hexagonal bins: nearest centre of the two lattices
+        nx, ny = self.gridsize
+        hx = (x - self.hex_origin[0]) / self.hex_size[0]
+        hy = (y - self.hex_origin[1]) / self.hex_size[1]
+        ix1, iy1 = np.round(hx).astype(int), np.round(hy).astype(int)
+        ix2, iy2 = np.floor(hx).astype(int), np.floor(hy).astype(int)
+        i1 = np.where((0 <= ix1) & (ix1 < nx + 1) & (0 <= iy1) & (iy1 < ny + 1), ix1 * (ny + 1) + iy1 + 1, 0)
+        i2 = np.where((0 <= ix2) & (ix2 < nx) & (0 <= iy2) & (iy2 < ny), ix2 * ny + iy2 + 1, 0)
+        first = (hx - ix1) ** 2 + 3.0 * (hy - iy1) ** 2 < (hx - ix2 - 0.5) ** 2 + 3.0 * (hy - iy2 - 0.5) ** 2
+        n1 = (nx + 1) * (ny + 1)
+        self.hex[:n1] += np.bincount(i1[first], minlength=1 + n1)[1:]
+        self.hex[n1:] += np.bincount(i2[~first], minlength=1 + nx * ny)[1:]
+        return self
+
+    def hex_offsets(self):
+        # Centre of every hexagon, in the order of self.hex
+        nx, ny = self.gridsize
+        offsets = np.empty((len(self.hex), 2))
+        n1 = (nx + 1) * (ny + 1)
+        offsets[:n1, 0] = np.repeat(np.arange(nx + 1), ny + 1)
+        offsets[:n1, 1] = np.tile(np.arange(ny + 1), nx + 1)
+        offsets[n1:, 0] = np.repeat(np.arange(nx) + 0.5, ny)
+        offsets[n1:, 1] = np.tile(np.arange(ny), nx) + 0.5
+        return offsets * self.hex_size + self.hex_origin
+
+    # PLOTTING ---------------------------------------------------------------------------------------------------------
+
+    def hist2d(self, ax, cmin=None, cmax=None, **kwargs):
+        # Same figure and return value as ax.hist2d(x, y, bins, ...)
+        h = self.rect.astype(float)
+        if cmin is not None:
+            h[h < cmin] = None
+        if cmax is not None:
+            h[h > cmax] = None
+        mesh = ax.pcolormesh(self.xedges, self.yedges, h.T, **kwargs)
+        ax.set_xlim(self.xedges[0], self.xedges[-1])
+        ax.set_ylim(self.yedges[0], self.yedges[-1])
+        return h, self.xedges, self.yedges, mesh
+
+    def hexbin(self, ax, cmap=None, norm=None, vmin=None, vmax=None, alpha=None, linewidths=None, edgecolors='face',
+               mincnt=None, **kwargs):
+        # Same figure and return value as ax.hexbin(x, y, gridsize, ...) (linear scales)
+        import matplotlib as mpl
+        from matplotlib import collections, transforms
+
+        accum = self.hex.astype(float)
+        offsets = self.hex_offsets()
+        if mincnt is not None:
+            keep = accum >= mincnt
+            accum, offsets = accum[keep], offsets[keep]
+
+        sx, sy = self.hex_size
+        polygon = [sx, sy / 3] * np.array([[.5, -.5], [.5, .5], [0., 1.], [-.5, .5], [-.5, -.5], [0., -1.]])
+        collection = collections.PolyCollection(
+            [polygon],
+            edgecolors=edgecolors,
+            linewidths=linewidths if linewidths is not None else [mpl.rcParams['patch.linewidth']],
+            offsets=offsets,
+            offset_transform=transforms.AffineDeltaTransform(ax.transData))
+        collection.set_cmap(cmap)
+        collection.set_norm(norm)
+        collection.set_array(accum)
+        collection.set_alpha(alpha)
+        collection.set(**kwargs)
+        collection.set_clim(vmin, vmax)
+        if collection.norm.vmin is None and collection.norm.vmax is None:
+            collection.norm.autoscale(accum)
+
+        xmin, xmax = self.hex_origin[0], self.hex_origin[0] + sx * self.gridsize[0]
+        ymin, ymax = self.hex_origin[1], self.hex_origin[1] + sy * self.gridsize[1]
+        ax.update_datalim(((xmin, ymin), (xmax, ymax)))
+        ax.autoscale_view(tight=True)
+        ax.add_collection(collection, autolim=False)
+        return collection
+
+    # PERSISTENCE ------------------------------------------------------------------------------------------------------
+
+    def save(self, path):
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        np.savez(path, extent=self.extent, bins=self.bins, gridsize=self.gridsize, rect=self.rect, hex=self.hex,
+                 count=self.count)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as saved:
+            grids = cls(tuple(saved['extent']), tuple(saved['bins']), tuple(saved['gridsize']))
+            grids.rect = saved['rect']
+            grids.hex = saved['hex']
+            grids.count = int(saved['count'])
+        return grids
+
+
+def binned_chunks(chunks, extent, bins=(30, 30), gridsize=30):
+    # Grids of a point stream that does not fit in memory: chunks yields (x, y) arrays, the extent must be known
+    grids = BinGrids(extent, bins, gridsize)
+    for x, y in chunks:
+        grids.add(x, y)
+    return grids
+
+
+def binned(x, y, bins=(30, 30), gridsize=30, cache_dir=None):
+    # BinGrids.from_points, stored under a hash of the points and the grid sizes (in CACHE_DIR unless cache_dir is
+    # given)
+    from render_cache import evict
+
+    cache_dir = cache_dir or CACHE_DIR
+    x = np.ascontiguousarray(x, dtype=float)
+    y = np.ascontiguousarray(y, dtype=float)
+    digest = hashlib.sha256(x.tobytes())
+    digest.update(y.tobytes())
+    digest.update(repr((bins, gridsize)).encode())
+    path = os.path.join(cache_dir, digest.hexdigest() + '.npz')
+
+    if os.path.exists(path):
+        # Mark as recently used (the cache is evicted least recently used first)
+        os.utime(path)
+        return BinGrids.load(path)
+    grids = BinGrids.from_points(x, y, bins, gridsize)
+    grids.save(path)
+    evict(cache_dir, MAX_BYTES)
+    return grids
+
+
+def clear(cache_dir=None):
+    # Remove every cached grid
+    import render_cache
+    render_cache.clear(cache_dir or CACHE_DIR)
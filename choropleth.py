@@ -0,0 +1,82 @@
+from collections import namedtuple
+
+import numpy as np
+
+# Data layer for the US-states choropleth.
+# The geometry is indexed once by state name and FIPS code. Value columns are attached as NumPy arrays aligned with the
+# geometry rows, so redrawing the map for another metric or time slice does not go through a pandas merge or a copy of
+# the GeoDataFrame: pass the arrays straight to GeoDataFrame.plot(column=...).
+
+# geometry: GeoDataFrame to plot, values: one array per attached column, aligned with the geometry rows,
+# unmatched: keys that have no geometry, missing: geometry rows that got no value (drawn with missing_kwds)
+Attached = namedtuple('Attached', ['geometry', 'values', 'unmatched', 'missing'])
+
+
+class ChoroplethLayer:
+
+    def __init__(self, states, name_column='name', fips_column='id'):
+        self.states = states
+
+        # State name and FIPS code -> geometry row
+        self.index = {}
+        if fips_column in states.columns:
+            self.index.update((str(code), row) for row, code in enumerate(states[fips_column]))
+        self.index.update((name, row) for row, name in enumerate(states[name_column]))
+
+        self._rows = {}
+        self._subsets = {}
+
+    def _key(self, key):
+        # Integer FIPS codes are stored as zero-padded strings ('06' for California)
+        if isinstance(key, (int, np.integer)):
+            return f'{key:02d}'
+        return key
+
+    def rows(self, keys):
+        # Geometry row of every key (-1 when the key is unknown), computed once per key sequence
+        keys = tuple(keys)
+        rows = self._rows.get(keys)
+        if rows is None:
+            rows = np.fromiter((self.index.get(self._key(k), -1) for k in keys), dtype=np.intp, count=len(keys))
+            self._rows[keys] = rows
+        return keys, rows
+
+    def _subset(self, matched_rows):
+        # Geometry restricted to the matched rows (what an inner merge keeps), cached per set of rows
+        key = matched_rows.tobytes()
+        subset = self._subsets.get(key)
+        if subset is None:
+            subset = self.states.iloc[matched_rows]
+            self._subsets[key] = subset
+        return subset
+
+    def attach(self, keys, *columns, how='left'):
+        # how='left' keeps every state (missing values are NaN), how='inner' only keeps the states that have data
+        keys, rows = self.rows(keys)
+        found = rows >= 0
+        unmatched = [k for k, ok in zip(keys, found) if not ok]
+
+        if how == 'left':
+            geometry = self.states
+            target = rows[found]
+            size = len(self.states)
+        elif how == 'inner':
+            matched_rows = np.unique(rows[found])
+            geometry = self._subset(matched_rows)
+            target = np.searchsorted(matched_rows, rows[found])
+            size = len(matched_rows)
+        else:
+            raise ValueError(f"how must be 'left' or 'inner', not {how!r}")
+
+        values = []
+        for column in columns:
+            column = np.asarray(column if hasattr(column, 'dtype') else list(column), dtype=float)
+            if len(column) != len(keys):
+                raise ValueError(f'got {len(column)} values for {len(keys)} keys')
+            aligned = np.full(size, np.nan)
+            aligned[target] = column[found]
+            values.append(aligned)
+
+        # Rows left without a value in any of the columns
+        missing = np.flatnonzero(np.isnan(np.vstack(values)).any(axis=0)) if values else np.arange(0)
+        return Attached(geometry, values, unmatched, missing)
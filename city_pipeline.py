@@ -0,0 +1,434 @@
+import argparse
+import hashlib
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+# Large-table versions of the lesson_3 city examples.
+# The source (CSV or Parquet) is read in chunks and reduced as it streams, so memory is bounded by the size of the
+# result (number of states, top N cities, ...) and not by the number of rows.
+#
+#   python city_pipeline.py aggregate cities.parquet --output Graphs/aggregation_streamed.png
+#   python city_pipeline.py top cities.parquet -k 20 --other
+#   python city_pipeline.py benchmark-top
+#   python city_pipeline.py filter cities.parquet --threshold 3000000
+#   python city_pipeline.py join populations.parquet areas.csv --limit 20
+
+DEFAULT_CHUNKSIZE = 1_000_000
+# Boolean column of top_k(..., other=True): True on the row that sums the remaining rows
+REMAINDER = 'remainder'
+
+
+# READING --------------------------------------------------------------------------------------------------------------
+
+def read_chunks(source, columns=None, chunksize=DEFAULT_CHUNKSIZE, categorical=()):
+    # DataFrames of at most chunksize rows from a CSV or Parquet file (or the DataFrame/iterable of chunks itself).
+    # Columns listed in categorical are read dictionary-encoded, as pandas categoricals.
+    if isinstance(source, pd.DataFrame):
+        for start in range(0, len(source), chunksize):
+            yield source.iloc[start:start + chunksize]
+        return
+    if not isinstance(source, (str, os.PathLike)):
+        yield from source
+        return
+
+    if os.path.splitext(source)[1].lower() in ('.parquet', '.pq'):
+        import pyarrow.parquet as pq
+        reader = pq.ParquetFile(source, read_dictionary=list(categorical) or None)
+        for batch in reader.iter_batches(batch_size=chunksize, columns=columns):
+            yield batch.to_pandas()
+    else:
+        dtype = {column: 'category' for column in categorical} or None
+        yield from pd.read_csv(source, usecols=columns, chunksize=chunksize, dtype=dtype)
+
+
+# AGGREGATION ----------------------------------------------------------------------------------------------------------
+
+def aggregate(source, by='State', value='Population', chunksize=DEFAULT_CHUNKSIZE):
+    # Same result as df.groupby(by)[value].sum().reset_index(), one chunk at a time
+    totals = None
+    for chunk in read_chunks(source, columns=[by, value], chunksize=chunksize):
+        partial = chunk.groupby(by, sort=False)[value].sum()
+
+        # Merge the partial sums into the running totals (one row per group)
+        totals = partial if totals is None else pd.concat([totals, partial]).groupby(level=0, sort=False).sum()
+
+    if totals is None:
+        return pd.DataFrame({by: [], value: []})
+    return totals.sort_index().rename_axis(by).reset_index()
+
+
+def plot_state_totals(ax, df_agg, by='State', value='Population'):
+    # Right-hand panel of the AGGREGATION figure in lesson_3.py
+    ax.bar(df_agg[by], df_agg[value], color='lightgreen')
+    ax.set_title('Total Population by State (Aggregated)', fontsize=16)
+    ax.set_xlabel('State', fontsize=14)
+    ax.set_ylabel('Total Population [millions]', fontsize=14)
+    ax.tick_params(axis='x', rotation=45)
+    ax.grid(axis='y', linestyle='--', alpha=0.3)
+
+    # Adding population values on the bars for aggregated values
+    for index, value in enumerate(df_agg[value]):
+        ax.text(index, value, f'{value:,}', ha='center', va='bottom', fontsize=10)
+
+
+# TOP-K SORTING --------------------------------------------------------------------------------------------------------
+
+def _largest(df, k, by):
+    # The k rows with the largest values, in no particular order (O(n) partial selection instead of a sort).
+    # Missing values rank last, as in sort_values: they only fill up the k rows when there are fewer valid values.
+    if k <= 0:
+        return df.iloc[:0]
+    if len(df) <= k:
+        return df
+    missing = df[by].isna().to_numpy()
+    if missing.any():
+        valid = np.flatnonzero(~missing)
+        if len(valid) <= k:
+            return df.iloc[np.concatenate([valid, np.flatnonzero(missing)[:k - len(valid)]])]
+        df = df.iloc[valid]
+    values = df[by].to_numpy()
+    return df.iloc[np.argpartition(values, len(values) - k)[-k:]]
+
+
+def top_k(source, k, by='Population', label='City', other=False, chunksize=DEFAULT_CHUNKSIZE):
+    # Same rows as df.sort_values(by, ascending=False).head(k); with other=True the remaining rows (if any) are summed
+    # into a final 'Other' row, flagged in the REMAINDER column. Only k candidates are kept between chunks.
+    best = None
+    total = 0
+    rows = 0
+    for chunk in read_chunks(source, columns=[label, by], chunksize=chunksize):
+        total += chunk[by].sum()
+        rows += len(chunk)
+        candidates = _largest(chunk, k, by)
+        if best is not None:
+            candidates = _largest(pd.concat([best, candidates], ignore_index=True), k, by)
+        best = candidates
+
+    if best is None:
+        best = pd.DataFrame({label: [], by: []})
+    best = best.sort_values(by=by, ascending=False, kind='stable').reset_index(drop=True)
+    if other:
+        best[REMAINDER] = False
+        if rows > len(best):
+            rest = pd.DataFrame({label: ['Other'], by: [total - best[by].sum()], REMAINDER: [True]})
+            best = pd.concat([best, rest], ignore_index=True)
+    return best
+
+
+def plot_top_k(ax, df_top, by='Population', label='City'):
+    # "After Sorting" panel of the SORTING figure in lesson_3.py, restricted to the top rows
+    # Bars are placed by position so that cities sharing a name keep a bar each; a city named 'Other' is a city
+    is_other = df_top[REMAINDER].to_numpy(dtype=bool) if REMAINDER in df_top else np.zeros(len(df_top), dtype=bool)
+    index = np.arange(len(df_top))
+    ax.bar(index, df_top[by], color=np.where(is_other, 'lightgray', 'skyblue'))
+    ax.set_title(f'Population of the {len(df_top) - is_other.sum()} Largest Cities', fontsize=16)
+    ax.set_xlabel('City', fontsize=14)
+    ax.set_ylabel('Population [millions]', fontsize=14)
+    ax.set_xticks(index)
+    ax.set_xticklabels(df_top[label], rotation=45)
+
+
+def benchmark_top_k(sizes=(10 ** 4, 10 ** 5, 10 ** 6, 10 ** 7), k=20, repeat=3, report=print):
+    # Full sort_values + head against the partial selection, on synthetic in-memory tables
+    rng = np.random.default_rng(0)
+    names = [f'City {i}' for i in range(1000)]
+    results = []
+    for n in sizes:
+        df = pd.DataFrame({'City': pd.Categorical.from_codes(rng.integers(0, len(names), n), names),
+                           'Population': rng.integers(1_000, 10_000_000, n)})
+        timings = {}
+        for name, select in [('sort', lambda: df.sort_values(by='Population', ascending=False).head(k)),
+                             ('top_k', lambda: top_k(df, k, chunksize=max(n, 1)))]:
+            best = float('inf')
+            for _ in range(repeat):
+                start = time.perf_counter()
+                select()
+                best = min(best, time.perf_counter() - start)
+            timings[name] = best
+        results.append({'rows': n, 'k': k, **timings})
+        report(f'{n:>12,} rows  sort {timings["sort"] * 1000:9.1f} ms  top_k {timings["top_k"] * 1000:9.1f} ms  '
+               f'x{timings["sort"] / timings["top_k"]:.1f}')
+    return results
+
+
+# FILTERING ------------------------------------------------------------------------------------------------------------
+
+OPERATORS = {'>': np.greater, '>=': np.greater_equal, '<': np.less, '<=': np.less_equal, '==': np.equal,
+             '!=': np.not_equal}
+
+
+def write_columnar(df, path, sort_by='Population', row_group_size=100_000):
+    # Parquet copy of a table, sorted so that the row-group min/max statistics let filters skip most of the file
+    if sort_by is not None:
+        df = df.sort_values(by=sort_by, kind='stable')
+    df.to_parquet(path, index=False, row_group_size=row_group_size)
+
+
+def _may_match(low, high, op, value):
+    # Whether a row group with values in [low, high] can hold a row where `row op value` holds
+    if op == '==':
+        return low <= value <= high
+    if op == '!=':
+        return not low == high == value
+    # For the orderings one of the two ends is the most favourable value
+    return bool(OPERATORS[op](np.array([low, high]), value).any())
+
+
+def matching_row_groups(path, column, op, value):
+    # Number of row groups that may contain matches (according to their statistics) and total number of row groups
+    import pyarrow.parquet as pq
+
+    metadata = pq.ParquetFile(path).metadata
+    position = metadata.schema.to_arrow_schema().get_field_index(column)
+    candidates = 0
+    for i in range(metadata.num_row_groups):
+        stats = metadata.row_group(i).column(position).statistics
+        if stats is None or not stats.has_min_max:
+            candidates += 1
+        elif _may_match(stats.min, stats.max, op, value):
+            candidates += 1
+    return candidates, metadata.num_row_groups
+
+
+def filter_rows(source, column='Population', op='>', value=3_000_000, columns=None, chunksize=DEFAULT_CHUNKSIZE):
+    # Rows where `column op value` holds. For Parquet the predicate is pushed down to the reader, which skips the row
+    # groups whose statistics rule out a match; CSV sources are filtered chunk by chunk.
+    if isinstance(source, (str, os.PathLike)) and os.path.splitext(source)[1].lower() in ('.parquet', '.pq'):
+        import pyarrow.parquet as pq
+        return pq.read_table(source, columns=columns, filters=[(column, op, value)]).to_pandas()
+
+    compare = OPERATORS[op]
+    parts = [chunk[compare(chunk[column].to_numpy(), value)]
+             for chunk in read_chunks(source, columns=columns, chunksize=chunksize)]
+    return pd.concat(parts, ignore_index=True) if parts else pd.DataFrame(columns=columns)
+
+
+def highlight_colors(mask, highlight='salmon', other='lightgrey'):
+    # One color per bar from a boolean mask (replaces the per-bar `city in df_filtered['City'].values` test)
+    return np.where(mask, highlight, other)
+
+
+def plot_filtered(ax, df, mask, value=3_000_000, column='Population', label='City'):
+    # "After Filtering" panel of the FILTERING figure in lesson_3.py
+    index = np.arange(len(df))
+    ax.bar(index, df[column], color=highlight_colors(mask))
+    ax.set_title(f'Cities with {column} Greater than {value / 1e6:g} Million', fontsize=16)
+    ax.set_xlabel(label, fontsize=14)
+    ax.set_ylabel(f'{column} [millions]', fontsize=14)
+    ax.set_xticks(index)
+    ax.set_xticklabels(df[label], rotation=45)
+
+
+# JOIN/MERGE -----------------------------------------------------------------------------------------------------------
+
+def _key_labels(values):
+    # Keys as text, on both sides of a join: the categorical batches read from CSV hold the key as text even where the
+    # dimension table parsed it as numbers
+    return pd.Index(np.asarray(values, dtype=object)).astype(str)
+
+
+class DimensionIndex:
+    # Hash index on a small dimension table (one row per City, e.g. the areas). The key is dictionary-encoded once:
+    # categories holds the distinct keys and every other column is stored as an array aligned with it.
+
+    def __init__(self, df, key='City'):
+        df = df.drop_duplicates(subset=key, keep='last')
+        self.key = key
+        self.categories = _key_labels(df[key])
+        self.dtype = pd.CategoricalDtype(self.categories)
+        self.columns = {column: df[column].to_numpy() for column in df.columns if column != key}
+
+        # Code mapping of the last categorical batch; consecutive batches usually share their dictionary
+        self._batch_categories = None
+        self._batch_mapping = None
+
+    def __len__(self):
+        return len(self.categories)
+
+    def codes(self, keys):
+        # Integer code of every key, -1 for keys that are not in the dimension table
+        if isinstance(keys, pd.Categorical) or isinstance(getattr(keys, 'dtype', None), pd.CategoricalDtype):
+            # Re-map the (few) categories instead of hashing every row
+            keys = pd.Categorical(keys)
+            if self._batch_categories is None or not keys.categories.equals(self._batch_categories):
+                self._batch_categories = keys.categories
+                self._batch_mapping = np.append(self.categories.get_indexer(_key_labels(keys.categories)), -1)
+            return self._batch_mapping[keys.codes]
+        return self.categories.get_indexer(_key_labels(keys))
+
+    def join(self, fact, suffixes=('_x', '_y')):
+        # Same rows as pd.merge(fact, dimension, on=key) for a dimension table with unique keys, keeping the order of
+        # the fact table. The key comes back as a categorical column; columns that are in both tables get the suffixes
+        # of pd.merge.
+        codes = self.codes(fact[self.key])
+        found = codes >= 0
+        if not found.all():
+            fact, codes = fact[found], codes[found]
+
+        shared = set(fact.columns) & set(self.columns)
+        joined = {self.key: pd.Categorical.from_codes(codes, dtype=self.dtype)}
+        joined.update((column + suffixes[0] if column in shared else column, fact[column].to_numpy())
+                      for column in fact.columns if column != self.key)
+        joined.update((column + suffixes[1] if column in shared else column, values[codes])
+                      for column, values in self.columns.items())
+        return pd.DataFrame(joined)
+
+    def join_batches(self, batches, suffixes=('_x', '_y')):
+        # Join a fact table that arrives in batches (see read_chunks), one batch at a time
+        for batch in batches:
+            yield self.join(batch, suffixes)
+
+
+_dimension_indexes = {}
+
+
+def dimension_index(source, key='City'):
+    # DimensionIndex for a file or DataFrame, built once and reused while the source is unchanged
+    if isinstance(source, pd.DataFrame):
+        digest = hashlib.sha256(pd.util.hash_pandas_object(source, index=False).to_numpy().tobytes())
+        digest.update(repr(list(source.columns)).encode())
+        cache_key = ('frame', digest.hexdigest(), key)
+    else:
+        cache_key = (os.path.abspath(source), os.path.getmtime(source), key)
+
+    index = _dimension_indexes.get(cache_key)
+    if index is None:
+        df = source if isinstance(source, pd.DataFrame) else pd.concat(read_chunks(source), ignore_index=True)
+        index = _dimension_indexes[cache_key] = DimensionIndex(df, key=key)
+    return index
+
+
+def join(fact_source, dimension_source, key='City', chunksize=DEFAULT_CHUNKSIZE):
+    # Stream the fact table (key read as a categorical) through the cached index of the dimension table
+    index = dimension_index(dimension_source, key=key)
+    batches = read_chunks(fact_source, chunksize=chunksize, categorical=[key])
+    parts = list(index.join_batches(batches))
+    if not parts:
+        return index.join(pd.DataFrame({key: []}))
+    return pd.concat(parts, ignore_index=True)
+
+
+def plot_population_area(ax1, df_merged, bar_width=0.35):
+    # Dual-axis bars of the JOIN/MERGE figure in lesson_3.py; returns the second axis
+    index = np.arange(len(df_merged))
+    ax1.bar(index, df_merged['Population'], bar_width, color='lightblue', label='Population')
+    ax2 = ax1.twinx()
+    ax2.bar(index + bar_width, df_merged['Area (sq mi)'], bar_width, color='gold', label='Area (sq mi)')
+
+    ax1.set_xlabel('City', fontsize=14)
+    ax1.set_ylabel('Population [millions]', fontsize=14)
+    ax2.set_ylabel('Area [sq miles]', fontsize=14)
+    ax1.set_title('Population and Area of Cities', fontsize=16)
+    ax1.set_xticks(index + bar_width / 2)
+    ax1.set_xticklabels(df_merged['City'], rotation=45)
+    ax1.legend(loc='upper left')
+    ax2.legend(loc='upper right')
+    ax1.yaxis.grid(True, linestyle='--', alpha=0.3)
+    return ax2
+
+
+# COMMAND LINE ---------------------------------------------------------------------------------------------------------
+
+def _aggregate_command(args):
+    import matplotlib.pyplot as plt
+
+    df_agg = aggregate(args.source, chunksize=args.chunksize)
+    fig, ax = plt.subplots(figsize=(15, 6))
+    plot_state_totals(ax, df_agg)
+    plt.tight_layout()
+    plt.savefig(args.output, bbox_inches='tight')
+    print(f'{len(df_agg)} states -> {args.output}')
+
+
+def _top_command(args):
+    import matplotlib.pyplot as plt
+
+    df_top = top_k(args.source, args.k, other=args.other, chunksize=args.chunksize)
+    fig, ax = plt.subplots(figsize=(15, 6))
+    plot_top_k(ax, df_top)
+    plt.tight_layout()
+    plt.savefig(args.output, bbox_inches='tight')
+    print(f'top {args.k} cities -> {args.output}')
+
+
+def _benchmark_top_command(args):
+    benchmark_top_k(sizes=[10 ** e for e in range(4, args.max_exponent + 1)], k=args.k)
+
+
+def _filter_command(args):
+    import matplotlib.pyplot as plt
+
+    if os.path.splitext(args.source)[1].lower() in ('.parquet', '.pq'):
+        candidates, total = matching_row_groups(args.source, 'Population', '>', args.threshold)
+        print(f'reading {candidates} of {total} row groups')
+    df_filtered = filter_rows(args.source, 'Population', '>', args.threshold, columns=['City', 'Population'],
+                              chunksize=args.chunksize)
+    df_filtered = df_filtered.sort_values(by='Population', ascending=False).head(args.limit)
+
+    fig, ax = plt.subplots(figsize=(15, 6))
+    plot_filtered(ax, df_filtered, np.ones(len(df_filtered), dtype=bool), value=args.threshold)
+    plt.tight_layout()
+    plt.savefig(args.output, bbox_inches='tight')
+    print(f'{len(df_filtered)} cities -> {args.output}')
+
+
+def _join_command(args):
+    import matplotlib.pyplot as plt
+
+    df_merged = join(args.facts, args.dimensions, chunksize=args.chunksize)
+    df_merged = df_merged.sort_values(by='Population', ascending=False).head(args.limit)
+
+    fig, ax1 = plt.subplots(figsize=(15, 6))
+    plot_population_area(ax1, df_merged)
+    plt.tight_layout()
+    plt.savefig(args.output, bbox_inches='tight')
+    print(f'{len(df_merged)} cities -> {args.output}')
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Render the lesson_3 city charts from large CSV/Parquet tables.')
+    parser.add_argument('--chunksize', type=int, default=DEFAULT_CHUNKSIZE, help='rows read at a time')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    command = commands.add_parser('aggregate', help='total population by state')
+    command.add_argument('source', help='CSV or Parquet file with State and Population columns')
+    command.add_argument('--output', default='Graphs/aggregation_streamed.png')
+    command.set_defaults(run=_aggregate_command)
+
+    command = commands.add_parser('top', help='largest cities, without sorting the whole table')
+    command.add_argument('source', help='CSV or Parquet file with City and Population columns')
+    command.add_argument('-k', type=int, default=20, help='number of bars')
+    command.add_argument('--other', action='store_true', help='add a bar with the total of the remaining cities')
+    command.add_argument('--output', default='Graphs/sorting_top.png')
+    command.set_defaults(run=_top_command)
+
+    command = commands.add_parser('benchmark-top', help='compare the top-k selection with a full sort')
+    command.add_argument('-k', type=int, default=20)
+    command.add_argument('--max-exponent', type=int, default=7, help='largest table has 10**N rows')
+    command.set_defaults(run=_benchmark_top_command)
+
+    command = commands.add_parser('filter', help='cities above a population threshold, with predicate pushdown')
+    command.add_argument('source', help='Parquet (or CSV) file with City and Population columns')
+    command.add_argument('--threshold', type=int, default=3_000_000)
+    command.add_argument('--limit', type=int, default=50, help='at most this many bars, largest first')
+    command.add_argument('--output', default='Graphs/filtering_pushdown.png')
+    command.set_defaults(run=_filter_command)
+
+    command = commands.add_parser('join', help='population and area per city from two tables')
+    command.add_argument('facts', help='CSV or Parquet file with City and Population columns (streamed)')
+    command.add_argument('dimensions', help='CSV or Parquet file with City and Area (sq mi) columns')
+    command.add_argument('--limit', type=int, default=20, help='at most this many cities, largest first')
+    command.add_argument('--output', default='Graphs/merge_joined.png')
+    command.set_defaults(run=_join_command)
+
+    args = parser.parse_args(argv)
+    args.run(args)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
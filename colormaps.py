@@ -0,0 +1,103 @@
+import os
+import sys
+import time
+
+import matplotlib
+import numpy as np
+
+# Colour mapping shared by the figures: the lessons colour values through a handful of colormaps (viridis for the
+# scatters and the tripcolor, Greens and Oranges for the count grids, magma and Blues for lines and the map).
+# Values are coloured with the colormap itself, cmap(norm(values)); a lookup table indexed per value measured slower
+# than that (0.45s against 0.24s for 10^7 values), so there is none. Colorbar gradients are drawn as a single image in
+# the colorbar instead of a mesh of colour cells.
+#
+#   python colormaps.py             # time fig.colorbar with colour cells against ColorMapper.colorbar
+
+
+class ColorMapper:
+
+    def __init__(self, cmap='viridis', vmin=None, vmax=None, norm=None):
+        from matplotlib.colors import Normalize
+
+        self.name = cmap
+        self.cmap = matplotlib.colormaps[cmap]
+        self.norm = Normalize(vmin, vmax) if norm is None else norm
+
+    def normalized(self, values):
+        # norm(values). Without a finite value an autoscaled norm has no limits to scale with (and would keep 0-0 from
+        # the empty data): every value is masked and gets the bad colour of the colormap
+        values = np.ma.masked_invalid(values)
+        if values.count():
+            self.norm.autoscale_None(values)
+        if not self.norm.scaled():
+            return np.ma.masked_all(values.shape)
+        return self.norm(values.data)
+
+    def rgba(self, values):
+        # uint8 RGBA of every value (for images and pixel buffers)
+        return self.cmap(self.normalized(values), bytes=True)
+
+    def colors(self, values):
+        # Float RGBA of every value, equal to cmap(norm(values)): pass as color= / facecolors= to an artist
+        return self.cmap(self.normalized(values))
+
+    def mappable(self):
+        # What plt.colorbar needs to draw the scale of artists coloured with colors()
+        from matplotlib.cm import ScalarMappable
+        return ScalarMappable(self.norm, self.cmap)
+
+    # COLORBAR ---------------------------------------------------------------------------------------------------------
+
+    def colorbar_image(self, length=None, width=1, orientation='vertical'):
+        # Gradient of the colorbar as a uint8 RGBA image (low values first along the long side); length defaults to one
+        # pixel per colour of the colormap
+        length = self.cmap.N if length is None else length
+        # Centres of the pixels, spread evenly between vmin and vmax
+        levels = self.norm.vmin + (np.arange(length) + 0.5) / length * (self.norm.vmax - self.norm.vmin)
+        strip = self.rgba(levels)
+        if orientation == 'vertical':
+            return np.ascontiguousarray(np.broadcast_to(strip[:, np.newaxis], (length, width, 4)))
+        return np.ascontiguousarray(np.broadcast_to(strip[np.newaxis], (width, length, 4)))
+
+    def colorbar(self, fig=None, ax=None, length=None, **kwargs):
+        # fig.colorbar with the gradient drawn as one image instead of a mesh of colour cells (linear norms;
+        # other norms keep the colour cells, their axis is not linear in the values)
+        import matplotlib.pyplot as plt
+        from matplotlib.colors import Normalize
+
+        fig = fig or plt.gcf()
+        cbar = fig.colorbar(self.mappable(), ax=ax, **kwargs)
+        if type(self.norm) is not Normalize or cbar.solids is None:
+            return cbar
+
+        vertical = cbar.orientation == 'vertical'
+        image = self.colorbar_image(length, orientation=cbar.orientation)
+        lo, hi = self.norm.vmin, self.norm.vmax
+        cbar.solids.remove()
+        cbar.solids = None
+        cbar.ax.imshow(image, origin='lower', aspect='auto', interpolation='nearest',
+                       extent=(0, 1, lo, hi) if vertical else (lo, hi, 0, 1), zorder=0)
+        # imshow autoscales: back to the limits of the colorbar
+        cbar.ax.set_xlim(*((0, 1) if vertical else (lo, hi)))
+        cbar.ax.set_ylim(*((lo, hi) if vertical else (0, 1)))
+        return cbar
+
+
+# DEMO -----------------------------------------------------------------------------------------------------------------
+
+if __name__ == '__main__':
+    import matplotlib.pyplot as plt
+
+    matplotlib.use('Agg')
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    mapper = ColorMapper('viridis', 0, 100)
+    for name, colorbar in (('fig.colorbar', lambda fig: fig.colorbar(mapper.mappable(), ax=fig.gca())),
+                           ('ColorMapper.colorbar', lambda fig: mapper.colorbar(fig, fig.gca()))):
+        start = time.perf_counter()
+        for _ in range(n):
+            fig = plt.figure(figsize=(2, 4))
+            fig.add_subplot()
+            colorbar(fig)
+            fig.savefig(os.devnull, format='pdf')
+            plt.close(fig)
+        print(f'{n} colorbars saved as PDF, {name:<22} {(time.perf_counter() - start) / n * 1000:6.1f} ms each')
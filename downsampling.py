@@ -0,0 +1,211 @@
+import os
+import sys
+import time
+
+import numpy as np
+
+# Reduce long series to the number of points the figure can actually show before they reach ax.plot / ax.scatter.
+# The lesson_4 line and scatter plots are 8x4 inches: at 100 dpi the axes are a few hundred pixels wide, so anything
+# beyond a couple of points per pixel column only costs draw time and file size.
+#
+#   minmax  first, last, min and max sample of every pixel column (exact envelope, fast, vectorized)
+#   lttb    Largest-Triangle-Three-Buckets (smoother, keeps the visual shape with one point per pixel)
+#
+#   python downsampling.py 5000000 out/    # full vs downsampled rendering of a long series (default: a temp dir)
+
+
+# PIXEL BUDGET ---------------------------------------------------------------------------------------------------------
+
+def pixel_size(ax=None, figsize=(8, 4), dpi=100):
+    # Width and height in pixels of the axes (or of a whole figure of the given size when there is no axes yet)
+    if ax is not None:
+        extent = ax.get_window_extent()
+        return max(int(extent.width), 1), max(int(extent.height), 1)
+    return int(figsize[0] * dpi), int(figsize[1] * dpi)
+
+
+# LINES ----------------------------------------------------------------------------------------------------------------
+
+def _numeric(x):
+    # x as numbers for bucketing: datetime64 and timedelta64 as int64 ticks (the indices then select the dates)
+    x = np.asarray(x)
+    return x.view(np.int64) if x.dtype.kind in 'mM' else x
+
+
+def _is_sorted(x):
+    # NaN and NaT (the smallest int64 tick) never count as sorted
+    x = _numeric(x)
+    return len(x) < 2 or bool((x[1:] >= x[:-1]).all())
+
+
+def _check_sorted(x):
+    if not _is_sorted(x):
+        raise ValueError('x must be sorted in increasing order and free of NaN/NaT')
+
+
+def _buckets(x, n_buckets):
+    # Start index of every non-empty bucket of equal x width; x must be sorted (and numeric, see _numeric)
+    edges = np.linspace(x[0], x[-1], n_buckets + 1)[1:-1]
+    starts = np.concatenate([[0], np.searchsorted(x, edges, side='left')])
+    return np.unique(starts)
+
+
+def _first_where(mask, starts):
+    # Index of the first True of mask at or after each start (each segment is known to contain one)
+    positions = np.flatnonzero(mask)
+    return positions[np.searchsorted(positions, starts)]
+
+
+def minmax(x, y, n_buckets):
+    # Indices of the first, min, max and last sample of each bucket, in x order. NaN values of y are left out of the
+    # min and max (a bucket of NaN only has none); the first NaN of a bucket is kept, so gaps in the line stay visible.
+    x = _numeric(x)
+    y = np.asarray(y, dtype=float)
+    if len(x) <= 4 * n_buckets:
+        return np.arange(len(x))
+    _check_sorted(x)
+
+    starts = _buckets(x, n_buckets)
+    counts = np.diff(np.append(starts, len(y)))
+    low, high = np.fmin.reduceat(y, starts), np.fmax.reduceat(y, starts)
+    valid = ~np.isnan(low)
+    lows = _first_where(y == np.repeat(low, counts), starts[valid])
+    highs = _first_where(y == np.repeat(high, counts), starts[valid])
+    ends = np.append(starts[1:], len(y)) - 1
+    missing = np.isnan(y)
+    gaps = _first_where(missing, starts[np.logical_or.reduceat(missing, starts)])
+    return np.unique(np.concatenate([starts, lows, highs, ends, gaps]))
+
+
+def lttb(x, y, n_out):
+    # Indices of the n_out points chosen by Largest-Triangle-Three-Buckets (first and last point always kept); x must be
+    # sorted
+    x = _numeric(x).astype(float)
+    y = np.asarray(y, dtype=float)
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+    _check_sorted(x)
+
+    # Equal-count buckets for the points between the first and the last one
+    edges = np.linspace(1, n - 1, n_out - 1).astype(int)
+    selected = np.empty(n_out, dtype=np.intp)
+    selected[0], selected[-1] = 0, n - 1
+
+    previous = 0
+    for i in range(n_out - 2):
+        start, end = edges[i], edges[i + 1]
+        following_end = edges[i + 2] if i + 2 < len(edges) else n
+        following_x = x[end:following_end].mean()
+        following_y = y[end:following_end].mean()
+
+        # Keep the point forming the largest triangle with the previous pick and the average of the next bucket
+        area = np.abs((x[previous] - following_x) * (y[start:end] - y[previous])
+                      - (x[previous] - x[start:end]) * (following_y - y[previous]))
+        previous = start + int(np.argmax(area))
+        selected[i + 1] = previous
+    return selected
+
+
+def downsample(x, y, n=None, method='minmax', ax=None):
+    # (x, y) reduced to about one point (lttb) or four points (minmax) per pixel column of ax
+    if n is None:
+        n = pixel_size(ax)[0]
+    if method == 'minmax':
+        index = minmax(x, y, n)
+    elif method == 'lttb':
+        index = lttb(x, y, n)
+    else:
+        raise ValueError(f"method must be 'minmax' or 'lttb', not {method!r}")
+    return np.asarray(x)[index], np.asarray(y)[index]
+
+
+def plot(ax, x, y, *args, method='minmax', **kwargs):
+    # Drop-in for ax.plot(x, y, ...) on long series; call it after the figure size and axes layout are set. Lines whose
+    # x is not sorted (paths, unordered samples) have no pixel columns to reduce to and are drawn as they are.
+    if not _is_sorted(x):
+        return ax.plot(x, y, *args, **kwargs)
+    x, y = downsample(x, y, method=method, ax=ax)
+    return ax.plot(x, y, *args, **kwargs)
+
+
+# SCATTER --------------------------------------------------------------------------------------------------------------
+
+def _axis_range(ax, axis, values):
+    # Range the points are drawn over along one axis: its limits when they are fixed, else the range of the points
+    # together with the data the axes already holds (the limits of an axis that was not autoscaled yet are (0, 1))
+    finite = values[np.isfinite(values)]
+    low, high = (finite.min(), finite.max()) if len(finite) else (0, 1)
+    if ax is None:
+        return low, high
+    if not (ax.get_autoscalex_on() if axis == 'x' else ax.get_autoscaley_on()):
+        return ax.get_xlim() if axis == 'x' else ax.get_ylim()
+    if ax.has_data():
+        data = ax.dataLim.intervalx if axis == 'x' else ax.dataLim.intervaly
+        low, high = min(low, data[0]), max(high, data[1])
+    return low, high
+
+
+def thin(x, y, *columns, ax=None, xlim=None, ylim=None, cell=1):
+    # Keep one point per cell x cell pixel square: overplotted markers are dropped, isolated points are all kept.
+    # Extra columns (sizes, colors, ...) are thinned alongside. Returns (index, x, y, *columns).
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    width, height = pixel_size(ax)
+    xlim = xlim or _axis_range(ax, 'x', x)
+    ylim = ylim or _axis_range(ax, 'y', y)
+
+    nx = max(width // cell, 1)
+    ny = max(height // cell, 1)
+    ix = np.clip(((x - xlim[0]) / (xlim[1] - xlim[0] or 1) * nx).astype(np.int64), 0, nx - 1)
+    iy = np.clip(((y - ylim[0]) / (ylim[1] - ylim[0] or 1) * ny).astype(np.int64), 0, ny - 1)
+    _, index = np.unique(iy * nx + ix, return_index=True)
+
+    # Keep the drawing order of the original points
+    index.sort()
+    return (index, x[index], y[index]) + tuple(np.asarray(c)[index] if np.ndim(c) else c for c in columns)
+
+
+def scatter(ax, x, y, s=None, c=None, cell=1, **kwargs):
+    # Drop-in for ax.scatter(x, y, s=s, c=c, ...) on very many points; set the axis limits first, or they are taken
+    # from the data
+    _, x, y, s, c = thin(x, y, s, c, ax=ax, cell=cell)
+    return ax.scatter(x, y, s=s, c=c, **kwargs)
+
+
+# DEMO -----------------------------------------------------------------------------------------------------------------
+
+def _timed_render(draw, output):
+    import matplotlib.pyplot as plt
+
+    fig, ax = plt.subplots(figsize=(8, 4))
+    start = time.perf_counter()
+    ax.set(xlim=(0, 10), ylim=(-2, 8))
+    draw(ax)
+    fig.savefig(output)
+    seconds = time.perf_counter() - start
+    points = sum(len(line.get_xdata()) for line in ax.lines)
+    plt.close(fig)
+    return seconds, points
+
+
+if __name__ == '__main__':
+    import tempfile
+
+    import matplotlib
+    matplotlib.use('Agg')
+
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    output_dir = sys.argv[2] if len(sys.argv) > 2 else tempfile.mkdtemp(prefix='downsampling-')
+    os.makedirs(output_dir, exist_ok=True)
+    rng = np.random.default_rng(0)
+    x = np.linspace(0, 10, n)
+    y = 4 + np.sin(2 * x) + rng.normal(0, 0.3, n)
+
+    for method in (None, 'minmax', 'lttb'):
+        output = os.path.join(output_dir, f'lineplot_{method or "full"}.png')
+        if method is None:
+            seconds, points = _timed_render(lambda ax: ax.plot(x, y, linewidth=2.0), output)
+        else:
+            seconds, points = _timed_render(lambda ax: plot(ax, x, y, method=method, linewidth=2.0), output)
+        print(f'{method or "full":>8}: {seconds:6.2f}s  {points:>10,} of {n:,} points drawn -> {output}')
@@ -0,0 +1,212 @@
+import argparse
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from city_pipeline import DEFAULT_CHUNKSIZE, read_chunks
+
+# Household-panel version of the LINE PLOT EXAMPLE in lesson_4.py (monthly energy consumption), for panels of many
+# households with hourly readings. Long-format readings (household, timestamp, energy) are read in chunks and summed
+# into a dense (households x months) array as they stream; the chart then shows the spread across households as a
+# P10-P90 band around the median, plus a few highlighted households. Whatever the number of households, the figure
+# holds one band, one median line and the highlighted lines: its render time and size depend on the months only.
+#
+#   python energy_panel.py --households 20000           # synthetic hourly readings for a year
+#   python energy_panel.py readings.parquet --highlight H1 H2
+
+COLUMNS = ('household', 'timestamp', 'energy')
+
+
+# MONTHLY TOTALS -------------------------------------------------------------------------------------------------------
+
+class MonthlyTotals:
+    # Running sum of the readings per household and calendar month; households and months are added as they appear
+
+    def __init__(self, household='household', timestamp='timestamp', value='energy'):
+        self.columns = (household, timestamp, value)
+        self.households = pd.Index([])
+        # Months are counted from 1970-01 (datetime64[M] as integers)
+        self.first_month = None
+        self.totals = np.zeros((0, 0))
+        self.counts = np.zeros((0, 0), dtype=np.int64)
+        self.readings = 0
+        # Readings without a timestamp (NaT), which belong to no month
+        self.skipped = 0
+
+    def _household_codes(self, keys):
+        codes = self.households.get_indexer(keys)
+        new = codes < 0
+        if new.any():
+            self.households = self.households.append(pd.Index(pd.unique(keys[new])))
+            codes[new] = self.households.get_indexer(keys[new])
+        return codes
+
+    def _resize(self, first_month, last_month):
+        # Grow the arrays to the known households and to the months from first_month to last_month
+        if self.first_month is not None:
+            first_month = min(first_month, self.first_month)
+            last_month = max(last_month, self.first_month + self.totals.shape[1] - 1)
+        shape = (len(self.households), last_month - first_month + 1)
+        if shape == self.totals.shape:
+            return
+        offset = 0 if self.first_month is None else self.first_month - first_month
+        for name in ('totals', 'counts'):
+            old = getattr(self, name)
+            new = np.zeros(shape, dtype=old.dtype)
+            new[:old.shape[0], offset:offset + old.shape[1]] = old
+            setattr(self, name, new)
+        self.first_month = first_month
+
+    def add(self, chunk):
+        household, timestamp, value = self.columns
+        # Readings with an offset (or 'Z') are counted in the UTC month, naive ones as they are; dropping the zone
+        # keeps datetime64 values, where a tz-aware column would come out of to_numpy() as objects
+        timestamps = pd.to_datetime(chunk[timestamp], utc=True).dt.tz_convert(None)
+        # NaT would become the smallest int64 month and stretch the arrays over the whole datetime64 range
+        valid = timestamps.notna().to_numpy()
+        timestamps = timestamps.to_numpy()
+        if not valid.all():
+            self.skipped += int((~valid).sum())
+            chunk, timestamps = chunk[valid], timestamps[valid]
+        codes = self._household_codes(chunk[household].to_numpy())
+        months = timestamps.astype('datetime64[M]').astype(np.int64)
+        values = chunk[value].to_numpy(dtype=float)
+        if not len(codes):
+            return self
+        self._resize(int(months.min()), int(months.max()))
+
+        # One vectorized sum per (household, month) of the chunk, then added into the dense arrays
+        grouped = pd.DataFrame({'h': codes, 'm': months - self.first_month, 'v': values}) \
+            .groupby(['h', 'm'], sort=False)['v'].agg(['sum', 'count'])
+        h = grouped.index.get_level_values('h').to_numpy()
+        m = grouped.index.get_level_values('m').to_numpy()
+        self.totals[h, m] += grouped['sum'].to_numpy()
+        self.counts[h, m] += grouped['count'].to_numpy()
+        self.readings += len(codes)
+        return self
+
+    @property
+    def months(self):
+        # First day of every month, as datetime64[M]
+        if self.first_month is None:
+            return np.array([], dtype='datetime64[M]')
+        return (self.first_month + np.arange(self.totals.shape[1])).astype('datetime64[M]')
+
+    def monthly(self):
+        # (households x months) totals, NaN where a household has no reading in a month
+        return np.where(self.counts > 0, self.totals, np.nan)
+
+    def household(self, key):
+        return self.monthly()[self.households.get_loc(key)]
+
+
+def monthly_totals(source, household='household', timestamp='timestamp', value='energy',
+                   chunksize=DEFAULT_CHUNKSIZE):
+    # MonthlyTotals of a CSV or Parquet file, a DataFrame or an iterable of chunks, read one chunk at a time
+    totals = MonthlyTotals(household, timestamp, value)
+    for chunk in read_chunks(source, columns=[household, timestamp, value], chunksize=chunksize):
+        totals.add(chunk)
+    return totals
+
+
+def percentile_bands(monthly, percentiles=(10, 50, 90)):
+    # (percentiles x months) across households, ignoring households without readings
+    if not len(monthly):
+        return np.full((len(percentiles), monthly.shape[1]), np.nan)
+    return np.nanpercentile(monthly, percentiles, axis=0)
+
+
+# CHART ----------------------------------------------------------------------------------------------------------------
+
+def plot_bands(ax, months, bands, highlighted=None, colors=None, band_color='lightsteelblue'):
+    # P10-P90 band, median line and highlighted households ({label: monthly values}) in the style of the lesson chart
+    from frame_renderer import palette
+
+    highlighted = highlighted or {}
+    x = np.arange(len(months))
+    low, median, high = bands
+    ax.fill_between(x, low, high, color=band_color, alpha=0.6, linewidth=0, label='P10-P90 of households')
+    ax.plot(x, median, color='black', linewidth=2.5, label='Median household')
+
+    colors = palette('magma', len(highlighted)) if colors is None else colors
+    for color, (label, values) in zip(colors, highlighted.items()):
+        ax.plot(x, values, marker='o', markeredgecolor='w', markeredgewidth=0.75, color=color, linewidth=1.5,
+                label=label)
+
+    labels = pd.DatetimeIndex(months).strftime('%b' if len(set(months.astype('datetime64[Y]'))) <= 1 else '%b %Y')
+    ax.set_xticks(x, labels, rotation=45)
+    ax.set_title('Monthly Energy Consumption of Households', fontsize=18)
+    ax.set_xlabel('Month', fontsize=14)
+    ax.set_ylabel('Energy Consumption [kWh]', fontsize=14)
+    ax.grid(True)
+    ax.legend(title='Households', fontsize=12)
+
+
+# SYNTHETIC PANEL ------------------------------------------------------------------------------------------------------
+
+def synthetic_readings(households, year=2023, households_per_chunk=200, seed=0):
+    # Hourly long-format readings of a year, a block of households per chunk; monthly totals of a few hundred kWh
+    # with a summer peak, as in the lesson's household lists
+    rng = np.random.default_rng(seed)
+    hours = np.arange(f'{year}-01-01T00', f'{year + 1}-01-01T00', dtype='datetime64[h]')
+    season = 1 + 0.25 * np.sin((hours.astype('datetime64[D]').astype(float) / 365.25 - 0.3) * 2 * np.pi)
+    for first in range(0, households, households_per_chunk):
+        ids = np.arange(first, min(first + households_per_chunk, households))
+        scale = rng.lognormal(np.log(0.5), 0.25, len(ids))[:, np.newaxis]
+        energy = scale * season * rng.gamma(4, 0.25, (len(ids), len(hours)))
+        yield pd.DataFrame({'household': np.repeat(ids, len(hours)), 'timestamp': np.tile(hours, len(ids)),
+                            'energy': energy.ravel()})
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Monthly energy percentile bands over a large household panel.')
+    parser.add_argument('source', nargs='?', help='CSV or Parquet file with household,timestamp,energy columns '
+                                                  '(default: synthetic hourly readings)')
+    parser.add_argument('--households', type=int, default=5_000, help='households of the synthetic panel')
+    parser.add_argument('--highlight', nargs='*', help='households drawn as lines (default: the first three)')
+    parser.add_argument('--chunksize', type=int, default=DEFAULT_CHUNKSIZE)
+    parser.add_argument('--output', default='Graphs/monthly_energy_consumption_bands.png')
+    args = parser.parse_args(argv)
+
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+    import export
+
+    source = args.source or synthetic_readings(args.households)
+    start = time.perf_counter()
+    totals = monthly_totals(source, chunksize=args.chunksize)
+    monthly = totals.monthly()
+    bands = percentile_bands(monthly)
+    prepared = time.perf_counter() - start
+
+    keys = list(totals.households[:3])
+    if args.highlight is not None:
+        # The command line gives text: read the keys as household ids of the data (integers for most files)
+        try:
+            keys = list(pd.Index(args.highlight, dtype=object).astype(totals.households.dtype))
+        except (TypeError, ValueError):
+            parser.error(f'--highlight: the households are identified by {totals.households.dtype} values')
+        unknown = [str(key) for key in keys if key not in totals.households]
+        if unknown:
+            parser.error(f'--highlight: unknown household(s) {", ".join(unknown)}')
+    highlighted = {f'Household {key}': totals.household(key) for key in keys}
+
+    start = time.perf_counter()
+    fig, ax = plt.subplots(figsize=(12, 6))
+    plot_bands(ax, totals.months, bands, highlighted)
+    export.tight_layout(fig)
+    output = export.savefig(args.output, fig=fig)
+    plt.close(fig)
+    if totals.skipped:
+        print(f'{totals.skipped:,} readings without a timestamp skipped')
+    print(f'{totals.readings:,} readings of {len(totals.households):,} households aggregated in {prepared:.2f}s '
+          f'({monthly.nbytes / 1e6:.1f} MB of monthly totals), {len(totals.months)} months drawn in '
+          f'{time.perf_counter() - start:.2f}s -> {output}')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
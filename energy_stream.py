@@ -0,0 +1,193 @@
+import argparse
+import socket
+import sys
+import time
+
+import numpy as np
+
+# Live version of the SCATTER PLOT EXAMPLE in lesson_4.py (energy consumption vs. average temperature).
+# Meter readings (temperature, energy, month) arrive from a generator, a growing CSV file or a socket, and are taken in
+# fixed-size batches into a ring buffer of preallocated NumPy arrays that holds the most recent points. The scatter is
+# created once and refreshed in place with set_offsets / set_array, so memory stays flat however long the stream runs.
+#
+#   python energy_stream.py --readings 100000    # synthetic stream, writes Graphs/energy_consumption_stream.png
+#   python energy_stream.py readings.csv          # follow a CSV file (temperature,energy,month per line)
+#   python energy_stream.py tcp://host:port       # same lines over a socket
+
+COLUMNS = ('temperature', 'energy', 'month')
+
+
+# SOURCES --------------------------------------------------------------------------------------------------------------
+
+def synthetic_readings(seed=42):
+    # Endless readings with the distribution of the lesson's synthetic data
+    rng = np.random.default_rng(seed)
+    month = 0
+    while True:
+        temperature = rng.uniform(5, 30)
+        yield temperature, temperature * 15 + rng.normal(0, 10), month % 12 + 1
+        month += 1
+
+
+def _parse(line):
+    fields = line.strip().split(',')
+    if len(fields) != len(COLUMNS):
+        return None
+    try:
+        return tuple(float(field) for field in fields)
+    except ValueError:
+        # Header or malformed line
+        return None
+
+
+def tail_csv(path, poll=0.5, follow=True):
+    # Readings from a CSV file, then from the lines appended to it (like tail -f)
+    with open(path, 'rb') as f:
+        pending = b''
+        while True:
+            pending += f.readline()
+            if not pending.endswith(b'\n'):
+                # End of file, possibly in the middle of a line that is still being written
+                if not follow:
+                    break
+                time.sleep(poll)
+                continue
+            reading = _parse(pending.decode('utf-8'))
+            pending = b''
+            if reading is not None:
+                yield reading
+
+    reading = _parse(pending.decode('utf-8')) if pending else None
+    if reading is not None:
+        yield reading
+
+
+def socket_lines(host, port):
+    # Readings sent as CSV lines over a TCP connection
+    with socket.create_connection((host, port)) as connection, connection.makefile('r', encoding='utf-8') as f:
+        for line in f:
+            reading = _parse(line)
+            if reading is not None:
+                yield reading
+
+
+def batches(readings, size=256):
+    # Fixed-size (n, 3) float arrays from an iterable of readings; the last batch may be shorter.
+    # The same array is reused for every batch, so consumers copy what they keep (RingBuffer.extend does).
+    batch = np.empty((size, len(COLUMNS)))
+    n = 0
+    for reading in readings:
+        batch[n] = reading
+        n += 1
+        if n == size:
+            yield batch
+            n = 0
+    if n:
+        yield batch[:n]
+
+
+# RING BUFFER ----------------------------------------------------------------------------------------------------------
+
+class RingBuffer:
+
+    def __init__(self, capacity, columns=len(COLUMNS)):
+        self.data = np.zeros((capacity, columns))
+        self.capacity = capacity
+        self.head = 0
+        self.size = 0
+        self.total = 0
+
+    def extend(self, batch):
+        # Overwrite the oldest rows with a batch of readings
+        batch = np.asarray(batch, dtype=float)[-self.capacity:]
+        n = len(batch)
+        first = min(n, self.capacity - self.head)
+        self.data[self.head:self.head + first] = batch[:first]
+        self.data[:n - first] = batch[first:]
+        self.head = (self.head + n) % self.capacity
+        self.size = min(self.size + n, self.capacity)
+        self.total += n
+
+    def view(self):
+        # The stored rows (unordered once the buffer has wrapped; a scatter does not care)
+        return self.data[:self.size]
+
+
+# LIVE SCATTER ---------------------------------------------------------------------------------------------------------
+
+class LiveScatter:
+
+    def __init__(self, capacity=10_000, xlim=(0, 35), ylim=(0, 550), figsize=(12, 6)):
+        import matplotlib.pyplot as plt
+
+        self.buffer = RingBuffer(capacity)
+        self.figure = plt.figure(figsize=figsize)
+        self.ax = self.figure.gca()
+
+        # Same styling as the lesson chart, created once with no points
+        self.scatter = self.ax.scatter(np.empty(0), np.empty(0), c=np.empty(0), cmap='viridis', vmin=1, vmax=12,
+                                       s=100, alpha=0.7, edgecolor='w')
+        self.ax.set(xlim=xlim, ylim=ylim)
+        self.ax.set_title('Energy Consumption vs. Average Temperature', fontsize=18)
+        self.ax.set_xlabel('Average Temperature [°C]', fontsize=14)
+        self.ax.set_ylabel('Energy Consumption [kWh]', fontsize=14)
+        cbar = self.figure.colorbar(self.scatter)
+        cbar.set_label('Month', fontsize=12)
+        self.figure.tight_layout()
+
+    def push(self, batch):
+        # Add a batch of readings and update the existing scatter artist
+        self.buffer.extend(batch)
+        points = self.buffer.view()
+        self.scatter.set_offsets(points[:, :2])
+        self.scatter.set_array(points[:, 2])
+
+    def run(self, readings, batch_size=256, every=1, on_refresh=None):
+        # Consume a stream; on_refresh(self) is called after every `every` batches (draw, save, push to a dashboard)
+        for i, batch in enumerate(batches(readings, batch_size)):
+            self.push(batch)
+            if on_refresh is not None and (i + 1) % every == 0:
+                on_refresh(self)
+
+
+# COMMAND LINE ---------------------------------------------------------------------------------------------------------
+
+def _source(argument):
+    if argument is None:
+        return synthetic_readings()
+    if argument.startswith('tcp://'):
+        host, port = argument[len('tcp://'):].rsplit(':', 1)
+        return socket_lines(host, int(port))
+    return tail_csv(argument)
+
+
+def main(argv=None):
+    import itertools
+    import tracemalloc
+
+    import matplotlib
+    matplotlib.use('Agg')
+
+    parser = argparse.ArgumentParser(description='Feed the energy vs. temperature scatter from a stream of readings.')
+    parser.add_argument('source', nargs='?', help='CSV file to follow or tcp://host:port (default: synthetic)')
+    parser.add_argument('--readings', type=int, default=1_000_000, help='stop after this many readings')
+    parser.add_argument('--capacity', type=int, default=5_000, help='number of recent points kept on the chart')
+    parser.add_argument('--output', default='Graphs/energy_consumption_stream.png')
+    args = parser.parse_args(argv)
+
+    live = LiveScatter(capacity=args.capacity)
+    tracemalloc.start()
+    memory = []
+    start = time.perf_counter()
+    live.run(itertools.islice(_source(args.source), args.readings), batch_size=1_000, every=10,
+             on_refresh=lambda view: memory.append(tracemalloc.get_traced_memory()[0]))
+    seconds = time.perf_counter() - start
+
+    live.figure.savefig(args.output, bbox_inches='tight')
+    print(f'{live.buffer.total:,} readings in {seconds:.1f}s, {live.buffer.size:,} points shown, '
+          f'traced memory {min(memory or [0]) / 1e3:.0f}-{max(memory or [0]) / 1e3:.0f} kB')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,373 @@
+import hashlib
+import json
+import os
+import sys
+import threading
+
+import matplotlib
+import numpy as np
+
+# Export path for the figures in Graphs/: drop-in replacements for plt.tight_layout() and
+# plt.savefig(..., bbox_inches='tight') that do the layout work once per figure template.
+# A template is identified by what decides the layout: figure size and dpi, style, axes positions, titles, labels,
+# tick labels, legends and texts. The subplot parameters found by tight_layout and the tight bounding box found by
+# savefig are kept in .cache/layouts under a hash of that signature, so a figure that was exported before is saved with
+# a single render (no layout pass, no extra draw to measure the tight box). Output format and compression are
+# selectable (PNG, WebP, SVG, PDF), per call or for a whole batch with configure() / the EXPORT_FORMAT and
+# EXPORT_COMPRESS_LEVEL environment variables (python render_all.py --format webp --compress-level 1).
+# With start_queue(), PNG and WebP encoding and file writes move to background threads (ExportQueue), so the next
+# figure is built while the previous one is written; flush() waits for them, wait(path) for one file.
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+CACHE_DIR = os.path.join(ROOT, '.cache', 'layouts')
+# The layout cache is kept under this size by evicting the least recently used entries (a few hundred bytes each)
+MAX_BYTES = 4 * 1024 * 1024
+FORMATS = ('png', 'webp', 'svg', 'pdf')
+
+# format=None keeps the extension of the file name; compress_level=None keeps the encoder defaults (same bytes as
+# plt.savefig). Levels go from 0 (fastest) to 9 (smallest) for PNG and PDF, and 0 to 6 for lossless WebP.
+SETTINGS = {'format': os.environ.get('EXPORT_FORMAT') or None,
+            'compress_level': int(os.environ['EXPORT_COMPRESS_LEVEL']) if os.environ.get('EXPORT_COMPRESS_LEVEL')
+            else None}
+
+
+def configure(**settings):
+    unknown = set(settings) - set(SETTINGS)
+    if unknown:
+        raise TypeError(f'unknown export setting(s): {", ".join(sorted(unknown))}')
+    if settings.get('format') not in (None, *FORMATS):
+        raise ValueError(f'unsupported format {settings["format"]!r}, expected one of {", ".join(FORMATS)}')
+    SETTINGS.update(settings)
+
+
+def settings():
+    return dict(SETTINGS)
+
+
+def output_path(fname, format=None):
+    # File name savefig() writes to: the extension follows the selected format
+    format = format or SETTINGS['format']
+    if format is None:
+        return fname
+    return os.path.splitext(fname)[0] + '.' + format
+
+
+# LAYOUT CACHE ---------------------------------------------------------------------------------------------------------
+
+def _text(artist):
+    return (artist.get_text(), artist.get_fontsize(), artist.get_rotation(), artist.get_visible())
+
+
+def _texts(artist):
+    # Every text of an axes or figure that is not a tick label: titles, labels added with text() and annotations
+    from matplotlib.text import Text
+    return [_text(t) + (t.get_position(),) for t in artist.get_children() if isinstance(t, Text)]
+
+
+def signature(fig):
+    # Hash of everything that moves the tight layout and the tight bounding box of a figure
+    from render_cache import style_fingerprint
+
+    parts = [matplotlib.__version__, style_fingerprint(), tuple(fig.get_size_inches()), fig.dpi, _texts(fig)]
+    for ax in fig.axes:
+        parts.append((ax.axison, ax.get_position().bounds, ax.get_xlim(), ax.get_ylim(), _texts(ax),
+                      _text(ax.xaxis.label), _text(ax.yaxis.label), ax.yaxis.get_label_position()))
+        for axis in (ax.xaxis, ax.yaxis):
+            # Tick labels as they will be drawn: locator and formatter, no rendering needed
+            locations = axis.get_majorticklocs()
+            labels = axis.get_ticklabels()
+            parts.append((list(axis.get_major_formatter().format_ticks(locations)), axis.get_ticks_position(),
+                          _text(labels[0]) if labels else None, sorted(axis.get_tick_params().items(), key=repr)))
+        legend = ax.get_legend()
+        if legend is not None:
+            # The box of the legend where it will be drawn (its location, anchor and texts)
+            parts.append((legend.get_window_extent().bounds, _text(legend.get_title()),
+                          [_text(t) for t in legend.get_texts()]))
+    return hashlib.sha256(json.dumps(parts, default=repr).encode()).hexdigest()
+
+
+def _load(key, cache_dir):
+    path = os.path.join(cache_dir, key + '.json')
+    if not os.path.exists(path):
+        return None
+    # Mark as recently used (the cache is evicted least recently used first)
+    os.utime(path)
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def _save(key, value, cache_dir):
+    from render_cache import evict
+
+    os.makedirs(cache_dir, exist_ok=True)
+    with open(os.path.join(cache_dir, key + '.json'), 'w', encoding='utf-8') as f:
+        json.dump(value, f)
+    evict(cache_dir, MAX_BYTES)
+
+
+def _drop_placeholder_engine(fig):
+    # tight_layout leaves a placeholder layout engine behind, which makes savefig run a layout draw of its own
+    from matplotlib.layout_engine import PlaceHolderLayoutEngine
+    if isinstance(fig.get_layout_engine(), PlaceHolderLayoutEngine):
+        fig.set_layout_engine(None)
+
+
+def tight_layout(fig=None, cache_dir=None):
+    # plt.tight_layout(), with the subplot parameters reused when the figure template was laid out before (layouts are
+    # kept in CACHE_DIR unless cache_dir is given)
+    import matplotlib.pyplot as plt
+
+    fig = fig or plt.gcf()
+    cache_dir = cache_dir or CACHE_DIR
+    key = 'layout-' + signature(fig)
+    params = _load(key, cache_dir)
+    if params is None:
+        fig.tight_layout()
+        p = fig.subplotpars
+        params = {'left': p.left, 'right': p.right, 'bottom': p.bottom, 'top': p.top, 'wspace': p.wspace,
+                  'hspace': p.hspace}
+        _save(key, params, cache_dir)
+    else:
+        fig.subplots_adjust(**params)
+    _drop_placeholder_engine(fig)
+    return params
+
+
+def tight_bbox(fig, pad_inches=None, cache_dir=None):
+    # Bounding box of bbox_inches='tight' (in inches, padded), measured once per template
+    from matplotlib.transforms import Bbox
+
+    cache_dir = cache_dir or CACHE_DIR
+    pad_inches = matplotlib.rcParams['savefig.pad_inches'] if pad_inches is None else pad_inches
+    key = f'bbox-{signature(fig)}-{pad_inches:g}'
+    bounds = _load(key, cache_dir)
+    if bounds is None:
+        # The same layout-only draw savefig does for 'tight'
+        fig.draw_without_rendering()
+        bounds = fig.get_tightbbox().padded(pad_inches).bounds
+        _save(key, bounds, cache_dir)
+    return Bbox.from_bounds(*bounds)
+
+
+# SAVE -----------------------------------------------------------------------------------------------------------------
+
+def _encoder_options(format, compress_level):
+    # (savefig keyword arguments, rcParams) that select the compression of each format
+    if compress_level is None:
+        return {}, {}
+    if format == 'png':
+        return {'pil_kwargs': {'compress_level': compress_level}}, {}
+    if format == 'webp':
+        return {'pil_kwargs': {'lossless': True, 'method': min(compress_level, 6)}}, {}
+    if format == 'pdf':
+        return {}, {'pdf.compression': compress_level}
+    return {}, {}
+
+
+def _prepare(fname, fig, format, compress_level, pad_inches, cache_dir):
+    # (figure, format, output path, tight box, savefig options, rcParams) of a savefig() call
+    import matplotlib.pyplot as plt
+
+    fig = fig or plt.gcf()
+    format = format or SETTINGS['format'] or os.path.splitext(fname)[1][1:].lower() or 'png'
+    compress_level = SETTINGS['compress_level'] if compress_level is None else compress_level
+    _drop_placeholder_engine(fig)
+    bbox = tight_bbox(fig, pad_inches, cache_dir)
+    options, rc = _encoder_options(format, compress_level)
+    return fig, format, output_path(fname, format), bbox, options, rc
+
+
+# Paths returned by savefig() (and passed to record()) since the last saved() call
+_saved = []
+
+
+def savefig(fname, fig=None, format=None, compress_level=None, pad_inches=None, cache_dir=None, **kwargs):
+    # plt.savefig(fname, bbox_inches='tight', ...) with the tight box from the layout cache; returns the written path.
+    # While an export queue is running (start_queue), PNG and WebP files are encoded and written in the background.
+    if _queue is not None:
+        path = _queue.savefig(fname, fig, format, compress_level, pad_inches, cache_dir, **kwargs)
+    else:
+        fig, format, path, bbox, options, rc = _prepare(fname, fig, format, compress_level, pad_inches, cache_dir)
+        with matplotlib.rc_context(rc):
+            fig.savefig(path, format=format, bbox_inches=bbox, **options, **kwargs)
+    _saved.append(path)
+    return path
+
+
+def record(path):
+    # Count a file put in place without savefig() (a render restored by render_cache) as saved
+    _saved.append(path)
+
+
+def saved():
+    # Paths written since the last call, in order (what savefig() returned, with the extension of the actual format)
+    paths = _saved[:]
+    del _saved[:]
+    return paths
+
+
+# EXPORT QUEUE ---------------------------------------------------------------------------------------------------------
+
+# Formats written from the RGBA buffer of the Agg canvas (vector formats are always saved in the calling thread)
+QUEUED_FORMATS = ('png', 'webp')
+
+_queue = None
+
+
+def _render_rgba(fig, bbox, kwargs):
+    # Draw the figure as savefig would (same dpi, tight box and colours) into an RGBA buffer; returns (array, dpi)
+    import io
+
+    dpi = kwargs.get('dpi') or matplotlib.rcParams['savefig.dpi']
+    dpi = fig.dpi if dpi == 'figure' else dpi
+    raw = io.BytesIO()
+    fig.savefig(raw, format='rgba', bbox_inches=bbox, **kwargs)
+    # Pixel size of the Agg renderer for a bbox_inches box (FigureCanvasBase.get_width_height, with its tolerance)
+    from matplotlib.transforms import Affine2D, Bbox, TransformedBbox
+    box = TransformedBbox(Bbox.from_bounds(0, 0, *bbox.size), Affine2D().scale(dpi))
+    width, height = (int(size + 1e-8) for size in box.max)
+    if raw.tell() != width * height * 4:
+        raise RuntimeError(f'unexpected buffer of {raw.tell()} bytes for a {width}x{height} figure')
+    return np.frombuffer(raw.getbuffer(), dtype=np.uint8).reshape(height, width, 4), dpi
+
+
+def _encode(path, rgba, format, dpi, metadata, pil_kwargs):
+    # What FigureCanvasAgg.print_png / print_webp do with the buffer: same encoder calls, same bytes
+    import matplotlib.image
+
+    matplotlib.image.imsave(path, memoryview(rgba), format=format, origin='upper', dpi=dpi, metadata=metadata,
+                            pil_kwargs=pil_kwargs)
+    return path
+
+
+class ExportQueue:
+    # Pipelined savefig: the figure is drawn into an RGBA buffer in the calling thread, which can then build the next
+    # figure while a pool of threads encodes the buffer and writes the file (the PNG/WebP encoders release the GIL).
+    # At most max_pending buffers wait for their encoder: savefig() blocks when the writers fall behind, which bounds
+    # the memory held by the queue.
+
+    def __init__(self, workers=2, max_pending=4):
+        from concurrent.futures import ThreadPoolExecutor
+
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='export')
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._lock = threading.Lock()
+        self._pending = {}
+        self._failures = []
+        # Absolute path -> futures of its writes that are still queued or failed, kept until wait() has seen them
+        self._outcomes = {}
+
+    def savefig(self, fname, fig=None, format=None, compress_level=None, pad_inches=None, cache_dir=None,
+                **kwargs):
+        # Same arguments and return value as export.savefig; the file is complete after flush()
+        fig, format, path, bbox, options, rc = _prepare(fname, fig, format, compress_level, pad_inches, cache_dir)
+        if format not in QUEUED_FORMATS:
+            with matplotlib.rc_context(rc):
+                fig.savefig(path, format=format, bbox_inches=bbox, **options, **kwargs)
+            return path
+
+        metadata = kwargs.pop('metadata', None)
+        pil_kwargs = {**options.get('pil_kwargs', {}), **(kwargs.pop('pil_kwargs', None) or {})} or None
+        self._slots.acquire()
+        try:
+            rgba, dpi = _render_rgba(fig, bbox, kwargs)
+            future = self._pool.submit(_encode, path, rgba, format, dpi, metadata, pil_kwargs)
+        except BaseException:
+            self._slots.release()
+            raise
+        with self._lock:
+            self._pending[future] = path
+            self._outcomes.setdefault(os.path.abspath(path), []).append(future)
+        future.add_done_callback(self._done)
+        return path
+
+    def _done(self, future):
+        error = future.exception()
+        with self._lock:
+            path = self._pending.pop(future)
+            if error is None:
+                # A successful write needs no outcome; a failed one stays for wait()
+                outcomes = self._outcomes.get(os.path.abspath(path), [])
+                if future in outcomes:
+                    outcomes.remove(future)
+                if not outcomes:
+                    self._outcomes.pop(os.path.abspath(path), None)
+        self._slots.release()
+        if error is not None:
+            with self._lock:
+                self._failures.append((path, error))
+            print(f'export of {path} failed: {error!r}', file=sys.stderr)
+
+    def pending(self):
+        with self._lock:
+            return list(self._pending.values())
+
+    def wait(self, path):
+        # Wait for the queued writes of one file; True when none of them failed since the last wait() for it, including
+        # writes that already finished (failures are still reported by failures() as well)
+        from concurrent.futures import wait
+
+        with self._lock:
+            futures = self._outcomes.pop(os.path.abspath(path), [])
+        wait(futures)
+        return all(future.exception() is None for future in futures)
+
+    def failures(self):
+        # (path, exception) of the writes that failed since the last call
+        with self._lock:
+            failures, self._failures = self._failures, []
+        return failures
+
+    def flush(self):
+        # Wait for every queued file; raises if any of them could not be written
+        from concurrent.futures import wait
+
+        with self._lock:
+            futures = list(self._pending)
+        wait(futures)
+        failures = self.failures()
+        if failures:
+            raise RuntimeError('export failed for ' + ', '.join(f'{path} ({error!r})' for path, error in failures))
+        return len(futures)
+
+    def close(self):
+        try:
+            self.flush()
+        finally:
+            self._pool.shutdown()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def start_queue(workers=2, max_pending=4):
+    # Route export.savefig through a background ExportQueue until stop_queue()
+    global _queue
+    if _queue is None:
+        _queue = ExportQueue(workers, max_pending)
+    return _queue
+
+
+def flush():
+    # Wait for the files queued so far (no-op without a queue)
+    return _queue.flush() if _queue is not None else 0
+
+
+def wait(path):
+    # Wait for the queued writes of one file; True when the file is complete (always without a queue)
+    return _queue.wait(path) if _queue is not None else True
+
+
+def failures():
+    # (path, exception) of the queued writes that failed since the last call
+    return _queue.failures() if _queue is not None else []
+
+
+def stop_queue():
+    global _queue
+    queue, _queue = _queue, None
+    if queue is not None:
+        queue.close()
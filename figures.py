@@ -0,0 +1,161 @@
+import argparse
+import importlib
+import os
+import re
+import subprocess
+import sys
+import time
+from contextlib import contextmanager
+
+# One function per figure of the lesson scripts, named after its file in Graphs/ (graph_comparison, hexbin, ...).
+# The figures are plain functions of the lesson modules that import the libraries they need themselves, so calling one
+# only loads those: the bar chart never touches pandas or the GIS stack, the map is the only figure that loads
+# geopandas. Calling a figure does not select a backend or change the working directory; that is up to the entry point
+# (render_all.py, or the command line below).
+#
+#   python figures.py                          # list the figures
+#   python figures.py graph_comparison hexbin  # render these two in this process, headless
+#   python figures.py --imports                # import-time report: one fresh interpreter per figure
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+# Figure name -> lesson module that defines it; lesson.<name>() draws the figure and saves Graphs/<name>.png
+FIGURES = {
+    'graph_comparison': 'lesson_1',
+    'us_states_population_map': 'lesson_2',
+    'sorting': 'lesson_3',
+    'aggregation': 'lesson_3',
+    'filtering': 'lesson_3',
+    'merge': 'lesson_3',
+    'lineplot': 'lesson_4',
+    'scatterplot': 'lesson_4',
+    'hist2d': 'lesson_4',
+    'stackplot': 'lesson_4',
+    'hexbin': 'lesson_4',
+    'triangular_color_plot': 'lesson_4',
+    'monthly_energy_consumption_multiple_households': 'lesson_4',
+    'energy_consumption_vs_temperature': 'lesson_4',
+}
+
+# Libraries that are slow to import, reported separately
+HEAVY = ('pandas', 'pyarrow', 'scipy', 'seaborn', 'geopandas', 'shapely', 'pyogrio', 'fiona', 'pyproj')
+GIS = ('geopandas', 'shapely', 'pyogrio', 'fiona', 'pyproj')
+
+IMPORT_TIME = re.compile(r'^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|( *)(\S+)\s*$')
+
+
+# FIGURES --------------------------------------------------------------------------------------------------------------
+
+def function(name):
+    # Imports the lesson module only; the figure imports the rest when it is called
+    return getattr(importlib.import_module(FIGURES[name]), name)
+
+
+def drawing(name):
+    # draw_<name> of the lesson: builds the figure from its inputs (the lesson's sample data or others) and returns it
+    return getattr(importlib.import_module(FIGURES[name]), f'draw_{name}')
+
+
+def output(name):
+    return f'Graphs/{name}.png'
+
+
+def location(name):
+    # 'lesson_4.py:123', where the figure function is defined
+    code = function(name).__code__
+    return f'{os.path.basename(code.co_filename)}:{code.co_firstlineno}'
+
+
+def select(patterns, names=FIGURES):
+    # Figures whose name or lesson contains one of the patterns (all of them without patterns)
+    if not patterns:
+        return list(names)
+    patterns = [p.lower() for p in patterns]
+    return [name for name in names if any(p in name or p in FIGURES[name] for p in patterns)]
+
+
+@contextmanager
+def default_style():
+    # Run a figure from the default style, as in a fresh interpreter. The rcParams the figure changes are restored
+    # afterwards and the figures it opened are closed; the caller's own figures are left alone.
+    import matplotlib.pyplot as plt
+
+    before = set(plt.get_fignums())
+    try:
+        with plt.style.context('default', after_reset=True):
+            yield
+    finally:
+        for number in set(plt.get_fignums()) - before:
+            plt.close(number)
+
+
+def render(name):
+    # Draw and save one figure; returns the seconds it took
+    start = time.perf_counter()
+    with default_style():
+        function(name)()
+    return time.perf_counter() - start
+
+
+# IMPORT REPORT --------------------------------------------------------------------------------------------------------
+
+def import_times(name):
+    # Seconds spent importing each top-level package while a fresh interpreter renders one figure
+    code = f'import figures; figures.render({name!r})'
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', code], cwd=ROOT,
+                            env={**os.environ, 'MPLBACKEND': 'Agg'}, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f'{name} failed:\n{result.stderr[-2000:]}')
+
+    packages = {}
+    for line in result.stderr.splitlines():
+        match = IMPORT_TIME.match(line)
+        if match is not None:
+            package = match.group(4).split('.')[0]
+            packages[package] = packages.get(package, 0) + int(match.group(1)) / 1e6
+    return packages
+
+
+def import_report(names, report=print):
+    report(f'{"figure":<48} {"imports":>8}  heavy libraries loaded')
+    results = {}
+    for name in names:
+        packages = import_times(name)
+        results[name] = packages
+        heavy = sorted((p for p in packages if p in HEAVY), key=lambda p: -packages[p])
+        loaded = ', '.join(f'{p} {packages[p]:.2f}s' for p in heavy) or '-'
+        report(f'{name:<48} {sum(packages.values()):7.2f}s  {loaded}')
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Render single lesson figures, or report what they import.')
+    parser.add_argument('names', nargs='*', help='figures to render (default: list them)')
+    parser.add_argument('--imports', action='store_true', help='report the import time of each figure')
+    args = parser.parse_args(argv)
+
+    unknown = [name for name in args.names if name not in FIGURES]
+    if unknown:
+        parser.error(f'unknown figure(s): {", ".join(unknown)}; choose from {", ".join(FIGURES)}')
+
+    if args.imports:
+        results = import_report(args.names or list(FIGURES))
+        gis = [name for name, packages in results.items() if any(p in GIS for p in packages)]
+        print(f'GIS libraries loaded by: {", ".join(gis) or "none"}')
+        return 0
+
+    if not args.names:
+        for name in FIGURES:
+            print(f'{name:<48} {location(name):<16} -> {output(name)}')
+        return 0
+
+    # Headless, from the repository root, as in the workers of render_all.py
+    import render_all
+    render_all._init_worker()
+    for name in args.names:
+        print(f'{render(name):6.2f}s  {name}')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
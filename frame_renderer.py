@@ -0,0 +1,194 @@
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+# Frame-by-frame rendering of the monthly energy line plot (LINE PLOT EXAMPLE in lesson_4.py) for dashboards and
+# videos. The figure, axes, labels, legend and gridlines are drawn once into a background; every frame then only moves
+# the line data (set_data), restores the background and redraws the lines (blitting), and hands the RGBA buffer to a
+# writer: a numbered PNG sequence or an ffmpeg process fed through a pipe.
+#
+#   python frame_renderer.py Frames/           # one PNG per month, plus a timing comparison with full re-renders
+
+MONTHS = ['Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec']
+
+
+def palette(name, n):
+    # Same colours as seaborn.color_palette(name, n_colors=n) for a matplotlib colormap
+    import matplotlib.pyplot as plt
+    return plt.get_cmap(name)(np.linspace(0, 1, n + 2)[1:-1])
+
+
+# WRITERS --------------------------------------------------------------------------------------------------------------
+
+class PngSequenceWriter:
+
+    def __init__(self, directory, pattern='frame_{:05d}.png', compress_level=1):
+        self.directory = directory
+        self.pattern = pattern
+        self.compress_level = compress_level
+        self.frames = 0
+        os.makedirs(directory, exist_ok=True)
+
+    def write(self, rgba):
+        from PIL import Image
+        Image.fromarray(rgba, 'RGBA').save(os.path.join(self.directory, self.pattern.format(self.frames)),
+                                           compress_level=self.compress_level)
+        self.frames += 1
+
+    def close(self):
+        pass
+
+
+class FFmpegWriter:
+    # Raw RGBA frames piped to ffmpeg, which encodes them as they arrive
+
+    def __init__(self, path, size, fps=12, codec='libx264'):
+        if shutil.which('ffmpeg') is None:
+            raise RuntimeError('ffmpeg was not found on PATH; use PngSequenceWriter instead')
+        width, height = size
+        self.frames = 0
+        self.process = subprocess.Popen(
+            ['ffmpeg', '-y', '-loglevel', 'error', '-f', 'rawvideo', '-pix_fmt', 'rgba', '-s', f'{width}x{height}',
+             '-r', str(fps), '-i', '-', '-c:v', codec, '-pix_fmt', 'yuv420p', path],
+            stdin=subprocess.PIPE)
+
+    def write(self, rgba):
+        self.process.stdin.write(rgba.tobytes())
+        self.frames += 1
+
+    def close(self):
+        self.process.stdin.close()
+        self.process.wait()
+
+
+# FRAME RENDERER -------------------------------------------------------------------------------------------------------
+
+class LineFrames:
+
+    def __init__(self, labels, x_labels=MONTHS, ylim=(250, 550), figsize=(12, 6), dpi=100, cmap='magma',
+                 title='Monthly Energy Consumption of Households (2023)', xlabel='Month',
+                 ylabel='Energy Consumption [kWh]', legend_title='Households'):
+        import matplotlib
+        from matplotlib.backends.backend_agg import FigureCanvasAgg
+        from matplotlib.figure import Figure
+
+        # Built once, with the styling of the lesson_4 chart. The limits are fixed so the axes never change.
+        self.figure = Figure(figsize=figsize, dpi=dpi)
+        self.canvas = FigureCanvasAgg(self.figure)
+        self.ax = ax = self.figure.add_subplot()
+        self.x = np.arange(len(x_labels))
+
+        colors = palette(cmap, len(labels))
+        self.lines = [ax.plot([], [], marker='o', color=colors[i], linewidth=2.5, label=label)[0]
+                      for i, label in enumerate(labels)]
+        ax.set_title(title, fontsize=18)
+        ax.set_xlabel(xlabel, fontsize=14)
+        ax.set_ylabel(ylabel, fontsize=14)
+        ax.grid(True)
+        ax.set_xticks(self.x)
+        ax.set_xticklabels(x_labels, rotation=45)
+        margin = matplotlib.rcParams['axes.xmargin'] * max(len(x_labels) - 1, 1)
+        ax.set_xlim(-margin, len(x_labels) - 1 + margin)
+        ax.set_ylim(*ylim)
+
+        # The legend copies the line styles before the lines become animated, so it stays in the background
+        ax.legend(title=legend_title, fontsize=12)
+        self.figure.tight_layout()
+        for line in self.lines:
+            line.set_animated(True)
+
+        self.canvas.draw()
+        self.background = self.canvas.copy_from_bbox(ax.bbox)
+
+    @property
+    def size(self):
+        # (width, height) in pixels, as FFmpegWriter expects it
+        return self.canvas.get_width_height()
+
+    def render(self, values):
+        # values: one row per line, NaN where a line has no point (yet); returns the frame as an RGBA array of its own
+        # (the canvas buffer is drawn over by the next frame)
+        for line, y in zip(self.lines, values):
+            line.set_data(self.x[:len(y)], y)
+
+        self.canvas.restore_region(self.background)
+        for line in self.lines:
+            self.ax.draw_artist(line)
+        self.canvas.blit(self.ax.bbox)
+        return np.asarray(self.canvas.buffer_rgba()).copy()
+
+    def write_frames(self, frames, writer):
+        # Render every frame of an iterable of value arrays into the writer; the writer is closed (and an ffmpeg
+        # process ended) even when a frame fails
+        count = 0
+        try:
+            for values in frames:
+                writer.write(self.render(values))
+                count += 1
+        finally:
+            writer.close()
+        return count
+
+
+def growing_frames(values):
+    # Month-by-month reveal: frame i shows the first i + 1 points of every line
+    values = np.asarray(values, dtype=float)
+    for i in range(values.shape[1]):
+        yield values[:, :i + 1]
+
+
+# DEMO -----------------------------------------------------------------------------------------------------------------
+
+def _full_render(values, labels, output):
+    # What producing one frame costs without this module: a new figure, the whole chart and savefig
+    import matplotlib.pyplot as plt
+
+    colors = palette('magma', len(labels))
+    plt.figure(figsize=(12, 6))
+    for i, label in enumerate(labels):
+        plt.plot(MONTHS[:values.shape[1]], values[i], marker='o', color=colors[i], linewidth=2.5, label=label)
+    plt.title('Monthly Energy Consumption of Households (2023)', fontsize=18)
+    plt.xlabel('Month', fontsize=14)
+    plt.ylabel('Energy Consumption [kWh]', fontsize=14)
+    plt.grid(True)
+    plt.xticks(rotation=45)
+    plt.legend(title='Households', fontsize=12)
+    plt.tight_layout()
+    plt.savefig(output)
+    plt.close()
+
+
+if __name__ == '__main__':
+    import matplotlib
+    matplotlib.use('Agg')
+
+    directory = sys.argv[1] if len(sys.argv) > 1 else 'Frames'
+    labels = ['Household 1', 'Household 2', 'Household 3']
+    values = np.array([[320, 280, 300, 350, 400, 450, 500, 480, 420, 380, 340, 310],
+                       [290, 310, 330, 370, 390, 430, 460, 490, 410, 360, 330, 300],
+                       [350, 300, 320, 360, 410, 440, 480, 500, 430, 390, 360, 340]])
+
+    start = time.perf_counter()
+    frames = LineFrames(labels)
+    setup = time.perf_counter() - start
+    start = time.perf_counter()
+    for frame in growing_frames(values):
+        frames.render(frame)
+    drawn = (time.perf_counter() - start) / values.shape[1]
+    start = time.perf_counter()
+    count = frames.write_frames(growing_frames(values), PngSequenceWriter(directory))
+    blitted = (time.perf_counter() - start) / count
+
+    with tempfile.TemporaryDirectory() as scratch:
+        start = time.perf_counter()
+        for i, frame in enumerate(growing_frames(values)):
+            _full_render(frame, labels, os.path.join(scratch, f'full_{i:05d}.png'))
+        full = (time.perf_counter() - start) / count
+
+    print(f'{count} frames in {directory}: setup {setup * 1000:.0f} ms, {drawn * 1000:.1f} ms per blitted frame '
+          f'({blitted * 1000:.1f} ms with PNG encoding) vs {full * 1000:.1f} ms per full render')
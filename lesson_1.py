@@ -1,77 +1,81 @@
 import matplotlib.pyplot as plt
 import numpy as np
 import os
+import export
 
-# Sample data
-quarters = ['Q1', 'Q2', 'Q3', 'Q4']
-product_A_sales = [150, 200, 250, 300]
-product_B_sales = [180, 220, 270, 320]
-product_C_sales = [120, 160, 210, 260]
 
-# Number of bars
-bar_width = 0.25
-x = np.arange(len(quarters))
+def draw_graph_comparison(sales, quarters, products):
+    from grouped_bars import GroupedBars
 
-# Create a directory for saving graphs if it doesn't exist
-if not os.path.exists('Graphs'):
-    os.makedirs('Graphs')
+    # Chart specifications: the same data with two sets of encodings
+    poorly_designed = GroupedBars(sales, quarters, products, colors=['red', 'orange', 'yellow'], alpha=0.5)
+    well_designed = GroupedBars(sales, quarters, products, colors=['#4CAF50', '#2196F3', '#FFC107'], edgecolor='black',
+                                value_labels=True)
 
-# Create a figure
-plt.figure(figsize=(12, 6))
+    # Create a figure
+    fig = plt.figure(figsize=(12, 6))
 
-# Poorly designed graph
-plt.subplot(1, 2, 1)
-plt.bar(x - bar_width, product_A_sales, width=bar_width, label='Product A', color='red', alpha=0.5)
-plt.bar(x, product_B_sales, width=bar_width, label='Product B', color='orange', alpha=0.5)
-plt.bar(x + bar_width, product_C_sales, width=bar_width, label='Product C', color='yellow', alpha=0.5)
+    # Poorly designed graph
+    plt.subplot(1, 2, 1)
+    poorly_designed.draw(plt.gca())
 
-# Title and labels for poorly designed graph
-#plt.title('Poorly Designed Graph', fontsize=16)
-plt.xticks(x, quarters, fontsize=12)
-plt.ylim(0, 350)
+    # Title and labels for poorly designed graph
+    #plt.title('Poorly Designed Graph', fontsize=16)
+    plt.xticks(fontsize=12)
+    plt.ylim(0, 350)
 
-# Adding grid lines behind the bars
-plt.grid(axis='y', linestyle='-', alpha=1, zorder=0)
+    # Adding grid lines behind the bars
+    plt.grid(axis='y', linestyle='-', alpha=1, zorder=0)
 
-# Adding misleading elements (keeping them empty for clarity)
-plt.text(0, 350, '', ha='center', color='black', fontsize=12)
-plt.text(1, 350, '', ha='center', color='black', fontsize=12)
-plt.text(2, 350, '', ha='center', color='black', fontsize=12)
-plt.text(3, 350, '', ha='center', color='black', fontsize=12)
+    # Adding misleading elements (keeping them empty for clarity)
+    plt.text(0, 350, '', ha='center', color='black', fontsize=12)
+    plt.text(1, 350, '', ha='center', color='black', fontsize=12)
+    plt.text(2, 350, '', ha='center', color='black', fontsize=12)
+    plt.text(3, 350, '', ha='center', color='black', fontsize=12)
 
-# ----------------------------------------------------------------------------------------------------------------------
+    # ------------------------------------------------------------------------------------------------------------------
 
-# Well-designed graph
-plt.subplot(1, 2, 2)
-bars_A = plt.bar(x - bar_width, product_A_sales, width=bar_width, label='Product A', color='#4CAF50', edgecolor='black')
-bars_B = plt.bar(x, product_B_sales, width=bar_width, label='Product B', color='#2196F3', edgecolor='black')
-bars_C = plt.bar(x + bar_width, product_C_sales, width=bar_width, label='Product C', color='#FFC107', edgecolor='black')
+    # Well-designed graph
+    plt.subplot(1, 2, 2)
+    well_designed.draw(plt.gca())  # Bars and data labels
 
-# Title and labels for well-designed graph
-#plt.title('Well-Designed Graph', fontsize=16, fontweight='bold')
-plt.xlabel('Quarters', fontsize=14)
-plt.ylabel('Sales [units]', fontsize=14)
-plt.xticks(x, quarters, fontsize=12)
-plt.ylim(0, 350)
+    # Title and labels for well-designed graph
+    #plt.title('Well-Designed Graph', fontsize=16, fontweight='bold')
+    plt.xlabel('Quarters', fontsize=14)
+    plt.ylabel('Sales [units]', fontsize=14)
+    plt.xticks(fontsize=12)
+    plt.ylim(0, 350)
 
-# Adding grid lines behind the bars
-plt.grid(axis='y', linestyle='--', alpha=0.5, zorder=0)
+    # Adding grid lines behind the bars
+    plt.grid(axis='y', linestyle='--', alpha=0.5, zorder=0)
 
-# Adding data labels
-for bars in [bars_A, bars_B, bars_C]:
-    for bar in bars:
-        yval = bar.get_height()
-        plt.text(bar.get_x() + bar.get_width()/2, yval + 5, str(yval), ha='center', fontsize=10, fontweight='bold')
+    # Adding a legend
+    plt.legend(loc='upper left', fontsize=12)
+    return fig
 
-# Adding a legend
-plt.legend(loc='upper left', fontsize=12)
 
-# Save the figure in the 'Graphs' directory
-plt.savefig('Graphs/graph_comparison.png', bbox_inches='tight')
+def graph_comparison():
+    # Sample data: one row per product, one column per quarter
+    quarters = ['Q1', 'Q2', 'Q3', 'Q4']
+    products = ['Product A', 'Product B', 'Product C']
+    sales = np.array([[150, 200, 250, 300],
+                      [180, 220, 270, 320],
+                      [120, 160, 210, 260]])
 
-# Show the plots
-plt.tight_layout()
-plt.show()
+    # Create a directory for saving graphs if it doesn't exist
+    if not os.path.exists('Graphs'):
+        os.makedirs('Graphs')
 
+    draw_graph_comparison(sales, quarters, products)
 
-# ----------------------------------------------------------------------------------------------------------------------
+    # Save the figure in the 'Graphs' directory
+    export.savefig('Graphs/graph_comparison.png')
+
+    plt.tight_layout()
+
+
+if __name__ == '__main__':
+    graph_comparison()
+
+    # Show the plots
+    plt.show()
@@ -1,301 +1,400 @@
-# LINEPLOT -------------------------------------------------------------------------------------------------------------
-
 import matplotlib.pyplot as plt
 import numpy as np
+import export
+
+# LINEPLOT -------------------------------------------------------------------------------------------------------------
+
+
+def draw_lineplot(x, y, x2, y2):
+    import downsampling
+
+    plt.style.use('_mpl-gallery')
+
+    # Create the plot with a specific figure size
+    fig, ax = plt.subplots(figsize=(8, 4))  # Width: 8, Height: 4
+
+    # Plot data
+    ax.plot(x2, y2 + 2.5, 'x', markeredgewidth=2, label='Sample Points')
+    downsampling.plot(ax, x, y, linewidth=2.0, label='Sine Wave')  # Long series are reduced to the pixel width
+    ax.plot(x2, y2 - 2.5, 'o-', linewidth=2, label='Another Sample')
 
-plt.style.use('_mpl-gallery')
+    # Set limits and ticks
+    ax.set(xlim=(0, 10), ylim=(-2, 8))
+    ax.set_xticks(np.arange(0, 11, 1))
+    ax.set_yticks(np.arange(0, 9, 1))
 
-# Generate data
-x = np.linspace(0, 10, 100)
-y = 4 + 1 * np.sin(2 * x)
-x2 = np.linspace(0, 10, 25)
-y2 = 4 + 1 * np.sin(2 * x2)
+    # Hide the tick labels
+    ax.set_xticks([])  # Remove x-axis tick labels
+    ax.set_yticks([])  # Remove y-axis tick labels
 
-# Create the plot with a specific figure size
-fig, ax = plt.subplots(figsize=(8, 4))  # Width: 8, Height: 4
+    plt.title('Line Plot of Sine Function')
+    plt.legend()
+    export.tight_layout()
+    return fig
 
-# Plot data
-ax.plot(x2, y2 + 2.5, 'x', markeredgewidth=2, label='Sample Points')
-ax.plot(x, y, linewidth=2.0, label='Sine Wave')
-ax.plot(x2, y2 - 2.5, 'o-', linewidth=2, label='Another Sample')
 
-# Set limits and ticks
-ax.set(xlim=(0, 10), ylim=(-2, 8))
-ax.set_xticks(np.arange(0, 11, 1))
-ax.set_yticks(np.arange(0, 9, 1))
+def lineplot():
+    # Generate data
+    x = np.linspace(0, 10, 100)
+    y = 4 + 1 * np.sin(2 * x)
+    x2 = np.linspace(0, 10, 25)
+    y2 = 4 + 1 * np.sin(2 * x2)
 
-# Hide the tick labels
-ax.set_xticks([])  # Remove x-axis tick labels
-ax.set_yticks([])  # Remove y-axis tick labels
+    draw_lineplot(x, y, x2, y2)
+    export.savefig('Graphs/lineplot.png')
 
-plt.title('Line Plot of Sine Function')
-plt.legend()
-plt.tight_layout()
-plt.savefig('Graphs/lineplot.png', bbox_inches='tight')
-plt.show()
+
+if __name__ == '__main__':
+    lineplot()
+    plt.show()
 
 
 # SCATTER PLOT ---------------------------------------------------------------------------------------------------------
 
-import matplotlib.pyplot as plt
-import numpy as np
 
-plt.style.use('_mpl-gallery')
+def draw_scatterplot(x, y, sizes, colors):
+    plt.style.use('_mpl-gallery')
+
+    # Create the plot with a specific figure size
+    fig, ax = plt.subplots(figsize=(8, 4))  # Width: 8, Height: 4
+
+    # Scatter plot
+    scatter = ax.scatter(x, y, s=sizes, c=colors, vmin=0, vmax=100, alpha=0.6)
 
-# Generate data
-np.random.seed(3)
-x = 4 + np.random.normal(0, 2, 24)
-y = 4 + np.random.normal(0, 2, len(x))
-sizes = np.random.uniform(15, 80, len(x))
-colors = np.random.uniform(15, 80, len(x))
+    # Set limits and ticks
+    ax.set(xlim=(0, 8), ylim=(0, 8))
+    ax.set_xticks(np.arange(0, 9, 1))
+    ax.set_yticks(np.arange(0, 9, 1))
 
-# Create the plot with a specific figure size
-fig, ax = plt.subplots(figsize=(8, 4))  # Width: 8, Height: 4
+    # Hide the tick labels
+    ax.set_xticks([])  # Remove x-axis tick labels
+    ax.set_yticks([])  # Remove y-axis tick labels
 
-# Scatter plot
-scatter = ax.scatter(x, y, s=sizes, c=colors, vmin=0, vmax=100, alpha=0.6)
+    plt.title('Scatter Plot of Random Data')
+    plt.colorbar(scatter, label='Color Scale')
+    export.tight_layout()
+    return fig
 
-# Set limits and ticks
-ax.set(xlim=(0, 8), ylim=(0, 8))
-ax.set_xticks(np.arange(0, 9, 1))
-ax.set_yticks(np.arange(0, 9, 1))
 
-# Hide the tick labels
-ax.set_xticks([])  # Remove x-axis tick labels
-ax.set_yticks([])  # Remove y-axis tick labels
+def scatterplot():
+    # Generate data
+    np.random.seed(3)
+    x = 4 + np.random.normal(0, 2, 24)
+    y = 4 + np.random.normal(0, 2, len(x))
+    sizes = np.random.uniform(15, 80, len(x))
+    colors = np.random.uniform(15, 80, len(x))
 
-plt.title('Scatter Plot of Random Data')
-plt.colorbar(scatter, label='Color Scale')
-plt.tight_layout()
-plt.savefig('Graphs/scatterplot.png', bbox_inches='tight')
-plt.show()
+    draw_scatterplot(x, y, sizes, colors)
+    export.savefig('Graphs/scatterplot.png')
+
+
+if __name__ == '__main__':
+    scatterplot()
+    plt.show()
 
 
 # HIST2D ---------------------------------------------------------------------------------------------------------------
 
-import matplotlib.pyplot as plt
-import numpy as np
 
-plt.style.use('_mpl-gallery-nogrid')
+def draw_hist2d(x, y):
+    import binning
 
-# Generate data
-np.random.seed(1)
-x = np.random.randn(5000)
-y = 1.2 * x + np.random.randn(5000) / 3
+    plt.style.use('_mpl-gallery-nogrid')
 
-# Create the plot with a specific figure size
-fig, ax = plt.subplots(figsize=(8, 4))  # Width: 8, Height: 4
+    # Create the plot with a specific figure size
+    fig, ax = plt.subplots(figsize=(8, 4))  # Width: 8, Height: 4
 
-# 2D histogram
-hist = ax.hist2d(x, y, bins=(30, 30), cmap='Greens')
+    # 2D histogram (drawn from the count grids, which are binned once and shared with the hexbin plot)
+    grids = binning.binned(x, y, bins=(30, 30), gridsize=30)
+    hist = grids.hist2d(ax, cmap='Greens')
 
-# Set limits
-ax.set(xlim=(-3, 3), ylim=(-3, 3))
+    # Set limits
+    ax.set(xlim=(-3, 3), ylim=(-3, 3))
 
-# Hide the tick labels
-ax.set_xticks([])  # Remove x-axis tick labels
-ax.set_yticks([])  # Remove y-axis tick labels
+    # Hide the tick labels
+    ax.set_xticks([])  # Remove x-axis tick labels
+    ax.set_yticks([])  # Remove y-axis tick labels
 
-plt.title('2D Histogram of Correlated Data')
-plt.colorbar(hist[3], label='Counts')
-plt.tight_layout()
-plt.savefig('Graphs/hist2d.png', bbox_inches='tight')
-plt.show()
+    plt.title('2D Histogram of Correlated Data')
+    plt.colorbar(hist[3], label='Counts')
+    export.tight_layout()
+    return fig
+
+
+def hist2d():
+    # Generate data
+    np.random.seed(1)
+    x = np.random.randn(5000)
+    y = 1.2 * x + np.random.randn(5000) / 3
+
+    draw_hist2d(x, y)
+    export.savefig('Graphs/hist2d.png')
+
+
+if __name__ == '__main__':
+    hist2d()
+    plt.show()
 
 # STACK PLOT -----------------------------------------------------------------------------------------------------------
 
-import matplotlib.pyplot as plt
-import numpy as np
 
-plt.style.use('_mpl-gallery')
+def draw_stackplot(x, y):
+    from stacked_area import StackedArea
+
+    plt.style.use('_mpl-gallery')
+
+    # Create the plot with a specific figure size
+    fig, ax = plt.subplots(figsize=(8, 4))  # Width: 8, Height: 4
 
-# Generate data
-x = np.arange(0, 10, 2)
-ay = [1, 1.25, 2, 2.75, 3]
-by = [1, 1, 1, 1, 1]
-cy = [2, 1, 2, 1, 2]
-y = np.vstack([ay, by, cy])
+    # Stack plot
+    stack = StackedArea(x, y, ['Group A', 'Group B', 'Group C'])
+    stack.draw(ax)
 
-# Create the plot with a specific figure size
-fig, ax = plt.subplots(figsize=(8, 4))  # Width: 8, Height: 4
+    # Set limits and ticks
+    ax.set(xlim=(0, 10), ylim=(0, 5))
+    ax.set_xticks(np.arange(0, 11, 2))
+    ax.set_yticks(np.arange(0, 6, 1))
 
-# Stack plot
-ax.stackplot(x, y, labels=['Group A', 'Group B', 'Group C'])
+    # Hide the tick labels
+    ax.set_xticks([])  # Remove x-axis tick labels
+    ax.set_yticks([])  # Remove y-axis tick labels
 
-# Set limits and ticks
-ax.set(xlim=(0, 10), ylim=(0, 5))
-ax.set_xticks(np.arange(0, 11, 2))
-ax.set_yticks(np.arange(0, 6, 1))
+    plt.title('Stack Plot of Group Data')
+    plt.legend(handles=stack.legend_handles(), loc='upper left')
+    export.tight_layout()
+    return fig
 
-# Hide the tick labels
-ax.set_xticks([])  # Remove x-axis tick labels
-ax.set_yticks([])  # Remove y-axis tick labels
 
-plt.title('Stack Plot of Group Data')
-plt.legend(loc='upper left')
-plt.tight_layout()
-plt.savefig('Graphs/stackplot.png', bbox_inches='tight')
-plt.show()
+def stackplot():
+    # Generate data
+    x = np.arange(0, 10, 2)
+    ay = [1, 1.25, 2, 2.75, 3]
+    by = [1, 1, 1, 1, 1]
+    cy = [2, 1, 2, 1, 2]
+    y = np.vstack([ay, by, cy])
+
+    draw_stackplot(x, y)
+    export.savefig('Graphs/stackplot.png')
+
+
+if __name__ == '__main__':
+    stackplot()
+    plt.show()
 
 
 # HEXBIN ---------------------------------------------------------------------------------------------------------------
 
-import matplotlib.pyplot as plt
-import numpy as np
 
-plt.style.use('_mpl-gallery-nogrid')
+def draw_hexbin(x, y):
+    import binning
+
+    plt.style.use('_mpl-gallery-nogrid')
+
+    # Create the plot with a specific figure size
+    fig, ax = plt.subplots(figsize=(8, 4))  # Width: 8, Height: 4
+
+    # Hexbin plot (drawn from the count grids, which are binned once and shared with the 2D histogram)
+    grids = binning.binned(x, y, bins=(30, 30), gridsize=30)
+    hb = grids.hexbin(ax, cmap="Oranges")
+
+    # Set limits
+    ax.set(xlim=(-3, 3), ylim=(-3, 3))
 
-# Generate data
-np.random.seed(1)
-x = np.random.randn(5000)
-y = 1.2 * x + np.random.randn(5000) / 3
+    # Hide the tick labels
+    ax.set_xticks([])  # Remove x-axis tick labels
+    ax.set_yticks([])  # Remove y-axis tick labels
 
-# Create the plot with a specific figure size
-fig, ax = plt.subplots(figsize=(8, 4))  # Width: 8, Height: 4
+    plt.title('Hexbin Plot of Correlated Data')
+    plt.colorbar(hb, label='Counts')
+    export.tight_layout()
+    return fig
 
-# Hexbin plot
-hb = ax.hexbin(x, y, gridsize=30, cmap="Oranges")
 
-# Set limits
-ax.set(xlim=(-3, 3), ylim=(-3, 3))
+def hexbin():
+    # Generate data
+    np.random.seed(1)
+    x = np.random.randn(5000)
+    y = 1.2 * x + np.random.randn(5000) / 3
 
-# Hide the tick labels
-ax.set_xticks([])  # Remove x-axis tick labels
-ax.set_yticks([])  # Remove y-axis tick labels
+    draw_hexbin(x, y)
+    export.savefig('Graphs/hexbin.png')
 
-plt.title('Hexbin Plot of Correlated Data')
-plt.colorbar(hb, label='Counts')
-plt.tight_layout()
-plt.savefig('Graphs/hexbin.png', bbox_inches='tight')
-plt.show()
+
+if __name__ == '__main__':
+    hexbin()
+    plt.show()
 
 # TRIP COLOR -----------------------------------------------------------------------------------------------------------
 
-import matplotlib.pyplot as plt
-import numpy as np
 
-plt.style.use('_mpl-gallery-nogrid')
+def draw_triangular_color_plot(x, y, z):
+    import triangulation_cache
+
+    plt.style.use('_mpl-gallery-nogrid')
+
+    # Create the plot with a specific figure size
+    fig, ax = plt.subplots(figsize=(8, 4))  # Width: 8, Height: 4
 
-# Generate data
-np.random.seed(1)
-x = np.random.uniform(-3, 3, 256)
-y = np.random.uniform(-3, 3, 256)
-z = (1 - x/2 + x**5 + y**3) * np.exp(-x**2 - y**2)
+    # Scatter plot of points
+    ax.plot(x, y, 'o', markersize=2, color='grey', label='Data Points')
 
-# Create the plot with a specific figure size
-fig, ax = plt.subplots(figsize=(8, 4))  # Width: 8, Height: 4
+    # Triangular color plot (the triangulation of the stations is computed once and cached)
+    mesh = triangulation_cache.cached_mesh(x, y)
+    tri = ax.tripcolor(mesh.triangulation, z, shading='gouraud', cmap='viridis')
 
-# Scatter plot of points
-ax.plot(x, y, 'o', markersize=2, color='grey', label='Data Points')
+    # Set limits
+    ax.set(xlim=(-3, 3), ylim=(-3, 3))
 
-# Triangular color plot
-tri = ax.tripcolor(x, y, z, shading='gouraud', cmap='viridis')
+    # Add a colorbar to indicate the scale of z values
+    plt.colorbar(tri, ax=ax, label='Function Value')
 
-# Set limits
-ax.set(xlim=(-3, 3), ylim=(-3, 3))
+    # Title and labels
+    plt.title('Triangular Color Plot of Function Values')
+    plt.xlabel('X-axis')
+    plt.ylabel('Y-axis')
 
-# Add a colorbar to indicate the scale of z values
-plt.colorbar(tri, ax=ax, label='Function Value')
+    export.tight_layout()
+    return fig
 
-# Title and labels
-plt.title('Triangular Color Plot of Function Values')
-plt.xlabel('X-axis')
-plt.ylabel('Y-axis')
 
-plt.tight_layout()
-plt.savefig('Graphs/triangular_color_plot.png', bbox_inches='tight')
-plt.show()
+def triangular_color_plot():
+    # Generate data
+    np.random.seed(1)
+    x = np.random.uniform(-3, 3, 256)
+    y = np.random.uniform(-3, 3, 256)
+    z = (1 - x/2 + x**5 + y**3) * np.exp(-x**2 - y**2)
+
+    draw_triangular_color_plot(x, y, z)
+    export.savefig('Graphs/triangular_color_plot.png')
+
+
+if __name__ == '__main__':
+    triangular_color_plot()
+    plt.show()
 
 # LINE PLOT EXAMPLE ----------------------------------------------------------------------------------------------------
-import pandas as pd
-import matplotlib.pyplot as plt
-import seaborn as sns
-import numpy as np
 
-# Create synthetic data for monthly energy consumption (in kWh) for multiple households
-months = ['Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec']
-household_1 = [320, 280, 300, 350, 400, 450, 500, 480, 420, 380, 340, 310]
-household_2 = [290, 310, 330, 370, 390, 430, 460, 490, 410, 360, 330, 300]
-household_3 = [350, 300, 320, 360, 410, 440, 480, 500, 430, 390, 360, 340]
 
-# Create a DataFrame
-data = pd.DataFrame({
-    'Month': months,
-    'Household 1': household_1,
-    'Household 2': household_2,
-    'Household 3': household_3
-})
+def draw_monthly_energy_consumption_multiple_households(data):
+    from frame_renderer import palette
+
+    # The style the earlier figures leave set up when the script runs top to bottom
+    plt.style.use('_mpl-gallery-nogrid')
+
+    # Create a color palette from orange to violet
+    colors = palette("magma", len(data.columns) - 1)
+
+    # Create the line plot
+    fig = plt.figure(figsize=(12, 6))
+    for i, household in enumerate(data.columns[1:]):
+        plt.plot(data['Month'], data[household], marker='o', markeredgecolor='w', markeredgewidth=0.75,
+                 color=colors[i], linewidth=2.5, label=household)
+
+    # Add titles and labels with units
+    plt.title('Monthly Energy Consumption of Households (2023)', fontsize=18)
+    plt.xlabel('Month', fontsize=14)
+    plt.ylabel('Energy Consumption [kWh]', fontsize=14)
+
+    # Add gridlines for better readability
+    plt.grid(True)
+
+    # Set x-ticks for better readability
+    plt.xticks(rotation=45)
+
+    # Add a legend
+    plt.legend(title='Households', fontsize=12)
+
+    # Tight layout for better spacing
+    export.tight_layout()
+    return fig
 
-# Create a color palette from orange to violet
-colors = sns.color_palette("magma", n_colors=len(data.columns) - 1)
 
-# Create the line plot
-plt.figure(figsize=(12, 6))
-for i, household in enumerate(data.columns[1:]):
-    sns.lineplot(data=data, x='Month', y=household, marker='o', color=colors[i], linewidth=2.5, label=household)
+def monthly_energy_consumption_multiple_households():
+    import pandas as pd
 
-# Add titles and labels with units
-plt.title('Monthly Energy Consumption of Households (2023)', fontsize=18)
-plt.xlabel('Month', fontsize=14)
-plt.ylabel('Energy Consumption [kWh]', fontsize=14)
+    # Create synthetic data for monthly energy consumption (in kWh) for multiple households
+    months = ['Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec']
+    household_1 = [320, 280, 300, 350, 400, 450, 500, 480, 420, 380, 340, 310]
+    household_2 = [290, 310, 330, 370, 390, 430, 460, 490, 410, 360, 330, 300]
+    household_3 = [350, 300, 320, 360, 410, 440, 480, 500, 430, 390, 360, 340]
 
-# Add gridlines for better readability
-plt.grid(True)
+    # Create a DataFrame
+    data = pd.DataFrame({
+        'Month': months,
+        'Household 1': household_1,
+        'Household 2': household_2,
+        'Household 3': household_3
+    })
 
-# Set x-ticks for better readability
-plt.xticks(rotation=45)
+    draw_monthly_energy_consumption_multiple_households(data)
 
-# Add a legend
-plt.legend(title='Households', fontsize=12)
+    # Save the figure
+    export.savefig('Graphs/monthly_energy_consumption_multiple_households.png')
 
-# Tight layout for better spacing
-plt.tight_layout()
 
-# Save the figure
-plt.savefig('Graphs/monthly_energy_consumption_multiple_households.png', bbox_inches='tight')
+if __name__ == '__main__':
+    monthly_energy_consumption_multiple_households()
 
-# Show the plot
-plt.show()
+    # Show the plot
+    plt.show()
 
 # SCATTER PLOT EXAMPLE -------------------------------------------------------------------------------------------------
-import pandas as pd
-import matplotlib.pyplot as plt
-import seaborn as sns
-import numpy as np
 
-# Create synthetic data
-np.random.seed(42)  # For reproducibility
-months = np.tile(np.arange(1, 13), 5)  # Repeat months for 5 years
-average_temperature = np.random.uniform(5, 30, size=len(months))  # Average temperature in degrees Celsius
-energy_consumption = average_temperature * 15 + np.random.normal(0, 10, size=len(months))  # Energy consumption in kWh
-
-# Create a DataFrame
-data = pd.DataFrame({
-    'Month': months,
-    'Average Temperature (°C)': average_temperature,
-    'Energy Consumption (kWh)': energy_consumption
-})
-
-# Create the scatter plot
-plt.figure(figsize=(12, 6))
-scatter = plt.scatter(data['Average Temperature (°C)'],
-                      data['Energy Consumption (kWh)'],
-                      c=data['Month'],
-                      cmap='viridis',
-                      s=100,
-                      alpha=0.7,
-                      edgecolor='w')
-
-# Add titles and labels with units
-plt.title('Energy Consumption vs. Average Temperature', fontsize=18)
-plt.xlabel('Average Temperature [°C]', fontsize=14)
-plt.ylabel('Energy Consumption [kWh]', fontsize=14)
-
-# Create a color bar
-cbar = plt.colorbar(scatter)
-cbar.set_label('Month', fontsize=12)
-
-# Show the plot
-plt.tight_layout()
-plt.savefig('Graphs/energy_consumption_vs_temperature.png', bbox_inches='tight')
-plt.show()
+
+def draw_energy_consumption_vs_temperature(data):
+    from colormaps import ColorMapper
+
+    # The style the earlier figures leave set up when the script runs top to bottom
+    plt.style.use('_mpl-gallery-nogrid')
+
+    # Map the months to colours once, through viridis
+    months_cmap = ColorMapper('viridis')
+    month_colors = months_cmap.colors(data['Month'])
+
+    # Create the scatter plot
+    fig = plt.figure(figsize=(12, 6))
+    scatter = plt.scatter(data['Average Temperature (°C)'],
+                          data['Energy Consumption (kWh)'],
+                          c=month_colors,
+                          s=100,
+                          alpha=0.7,
+                          edgecolor='w')
+
+    # Add titles and labels with units
+    plt.title('Energy Consumption vs. Average Temperature', fontsize=18)
+    plt.xlabel('Average Temperature [°C]', fontsize=14)
+    plt.ylabel('Energy Consumption [kWh]', fontsize=14)
+
+    # Create a color bar
+    cbar = plt.colorbar(months_cmap.mappable(), ax=plt.gca(), alpha=0.7)
+    cbar.set_label('Month', fontsize=12)
+
+    export.tight_layout()
+    return fig
+
+
+def energy_consumption_vs_temperature():
+    import pandas as pd
+
+    # Create synthetic data
+    np.random.seed(42)  # For reproducibility
+    months = np.tile(np.arange(1, 13), 5)  # Repeat months for 5 years
+    average_temperature = np.random.uniform(5, 30, size=len(months))  # Average temperature in degrees Celsius
+    energy_consumption = average_temperature * 15 + np.random.normal(0, 10, size=len(months))  # Energy in kWh
+
+    # Create a DataFrame
+    data = pd.DataFrame({
+        'Month': months,
+        'Average Temperature (°C)': average_temperature,
+        'Energy Consumption (kWh)': energy_consumption
+    })
+
+    draw_energy_consumption_vs_temperature(data)
+    export.savefig('Graphs/energy_consumption_vs_temperature.png')
+
+
+if __name__ == '__main__':
+    energy_consumption_vs_temperature()
+
+    # Show the plot
+    plt.show()
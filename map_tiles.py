@@ -0,0 +1,248 @@
+import argparse
+import hashlib
+import json
+import math
+import os
+import sys
+import time
+
+import numpy as np
+
+from choropleth import ChoroplethLayer
+from us_states import TOLERANCES, load_states
+
+# Tile pyramid of the US-states choropleth (lesson_2.py) for interactive maps: 256 px PNG tiles in the z/x/y layout of
+# web maps (Web Mercator, y counted from the north), written to Tiles/<z>/<x>/<y>.png.
+# Every zoom level uses the coarsest cached geometry of us_states.py that is still finer than one pixel, and a tile
+# only draws the states that intersect it, fill and boundary together as one collection. The colour of every state and
+# the geometry of the level are hashed per tile into Tiles/manifest.json; rendering again with new values only redraws
+# the tiles whose hash changed, so an update costs what it touches. Keep the colour range fixed (vmin / vmax) for
+# updates to stay local: with the default range a new minimum or maximum changes every colour.
+#
+#   python map_tiles.py                       # zoom levels 0-6 of the density column of the GeoJSON
+#   python map_tiles.py --set Texas=300       # same, with one state changed: only its tiles are redrawn
+
+TILES_DIR = 'Tiles'
+TILE_SIZE = 256
+# Half the width of the Web Mercator square, in metres
+EXTENT = math.pi * 6378137.0
+MAX_LATITUDE = 85.0511287798
+
+
+def _mercator(coords):
+    # (lon, lat) in degrees -> Web Mercator (x, y) in metres
+    lon = np.radians(coords[:, 0])
+    lat = np.radians(np.clip(coords[:, 1], -MAX_LATITUDE, MAX_LATITUDE))
+    return np.column_stack([lon * 6378137.0, np.log(np.tan(np.pi / 4 + lat / 2)) * 6378137.0])
+
+
+def tile_bounds(z, x, y):
+    # (xmin, ymin, xmax, ymax) of a tile in Web Mercator metres
+    size = 2 * EXTENT / 2 ** z
+    return -EXTENT + x * size, EXTENT - (y + 1) * size, -EXTENT + (x + 1) * size, EXTENT - y * size
+
+
+def tolerance_for(z, tile_size=TILE_SIZE):
+    # Coarsest cached simplification (in degrees) below the width of one pixel at zoom z
+    pixel = 360 / (tile_size * 2 ** z)
+    return max(t for t in TOLERANCES if t <= pixel)
+
+
+def _path(geometry):
+    # One matplotlib path per state: every polygon and hole of the geometry, with holes cut out of the fill
+    from matplotlib.path import Path
+
+    polygons = getattr(geometry, 'geoms', [geometry])
+    rings = [ring for polygon in polygons for ring in (polygon.exterior, *polygon.interiors)]
+    return Path.make_compound_path(*(Path(np.asarray(ring.coords)[:, :2], closed=True) for ring in rings))
+
+
+class Level:
+    # Geometry of one zoom level: projected paths and which states every tile touches
+
+    def __init__(self, z, states, tile_size=TILE_SIZE):
+        import shapely
+
+        self.z = z
+        self.tolerance = tolerance_for(z, tile_size)
+        geometry = shapely.transform(np.asarray(load_states(self.tolerance).geometry.loc[states.index]), _mercator)
+        self.paths = [_path(g) for g in geometry]
+        self.digest = hashlib.sha256(b''.join(shapely.to_wkb(geometry))).hexdigest()
+
+        # Candidate tiles from the bounding boxes, then an exact intersection test per (tile, state)
+        size = 2 * EXTENT / 2 ** z
+        bounds = shapely.bounds(geometry)
+        first = np.floor((bounds[:, [0, 3]] * [1, -1] + EXTENT) / size).astype(int)
+        last = np.floor((bounds[:, [2, 1]] * [1, -1] + EXTENT) / size).astype(int)
+        first, last = first.clip(0, 2 ** z - 1), last.clip(0, 2 ** z - 1)
+        candidates = {}
+        for row, ((x0, y0), (x1, y1)) in enumerate(zip(first, last)):
+            for x in range(x0, x1 + 1):
+                for y in range(y0, y1 + 1):
+                    candidates.setdefault((x, y), []).append(row)
+        self.tiles = {}
+        for (x, y), rows in sorted(candidates.items()):
+            rows = np.asarray(rows)
+            rows = rows[shapely.intersects(geometry[rows], shapely.box(*tile_bounds(z, x, y)))]
+            if len(rows):
+                self.tiles[(x, y)] = rows
+
+
+class TilePyramid:
+
+    def __init__(self, states=None, zooms=range(7), directory=TILES_DIR, cmap='Blues', vmin=None, vmax=None,
+                 edgecolor='black', linewidth=0.75, missing_color='lightgray', tile_size=TILE_SIZE):
+        self.states = load_states() if states is None else states
+        self.layer = ChoroplethLayer(self.states)
+        self.levels = [Level(z, self.states, tile_size) for z in zooms]
+        self.directory = directory
+        self.cmap = cmap
+        self.vmin = vmin
+        self.vmax = vmax
+        self.edgecolor = edgecolor
+        self.linewidth = linewidth
+        self.missing_color = missing_color
+        self.tile_size = tile_size
+        self._figure = None
+
+    # COLOURS ----------------------------------------------------------------------------------------------------------
+
+    def colors(self, data):
+        # uint8 RGBA fill of every state for {state name or FIPS code: value}; states without a value are missing (all
+        # of them for empty or all-NaN data, which leaves no range to normalize)
+        import matplotlib
+        from matplotlib.colors import Normalize, to_rgba
+
+        values = self.layer.attach(data.keys(), data.values(), how='left').values[0]
+        found = ~np.isnan(values)
+        rgba = np.tile(to_rgba(self.missing_color), (len(values), 1))
+        if found.any():
+            norm = Normalize(self.vmin, self.vmax)
+            norm.autoscale_None(values[found])
+            rgba[found] = matplotlib.colormaps[self.cmap](norm(values[found]))
+        return np.round(rgba * 255).astype(np.uint8)
+
+    def _style(self):
+        return json.dumps([self.edgecolor, self.linewidth, self.tile_size]).encode()
+
+    def digest(self, level, rows, colors):
+        # What a tile shows: its states, their colours, the geometry of the level and the line style
+        digest = hashlib.sha256(self._style())
+        digest.update(level.digest.encode())
+        digest.update(rows.tobytes())
+        digest.update(colors[rows].tobytes())
+        return digest.hexdigest()
+
+    # RENDERING --------------------------------------------------------------------------------------------------------
+
+    def _canvas(self):
+        # One figure for every tile: an axes that fills it, without frame or background, 1 point = 1 pixel
+        if self._figure is None:
+            from matplotlib.collections import PathCollection
+            from matplotlib.figure import Figure
+
+            fig = Figure(figsize=(self.tile_size / 72, self.tile_size / 72), dpi=72)
+            fig.patch.set_alpha(0)
+            ax = fig.add_axes((0, 0, 1, 1))
+            ax.set_axis_off()
+            collection = PathCollection([], edgecolors=self.edgecolor, linewidths=self.linewidth,
+                                        transform=ax.transData)
+            ax.add_collection(collection, autolim=False)
+            self._figure = fig, ax, collection
+        return self._figure
+
+    def render_tile(self, level, x, y, colors):
+        from PIL import Image
+
+        fig, ax, collection = self._canvas()
+        rows = level.tiles[(x, y)]
+        collection.set_paths([level.paths[row] for row in rows])
+        collection.set_facecolor(colors[rows] / 255)
+        xmin, ymin, xmax, ymax = tile_bounds(level.z, x, y)
+        ax.set_xlim(xmin, xmax)
+        ax.set_ylim(ymin, ymax)
+        fig.canvas.draw()
+
+        path = os.path.join(self.directory, str(level.z), str(x), f'{y}.png')
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        Image.fromarray(np.asarray(fig.canvas.buffer_rgba()), 'RGBA').save(path, compress_level=1)
+        return path
+
+    def _manifest(self):
+        path = os.path.join(self.directory, 'manifest.json')
+        if not os.path.exists(path):
+            return {}
+        with open(path, encoding='utf-8') as f:
+            return json.load(f)
+
+    def render(self, data, force=False):
+        # Bring the tiles up to date with data; returns the numbers of (redrawn, unchanged, removed) tiles
+        from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+        fig, _, _ = self._canvas()
+        FigureCanvasAgg(fig)
+        colors = self.colors(data)
+        saved = {} if force else self._manifest()
+        manifest = {}
+        redrawn = 0
+        for level in self.levels:
+            for (x, y), rows in level.tiles.items():
+                key = f'{level.z}/{x}/{y}'
+                manifest[key] = self.digest(level, rows, colors)
+                if saved.get(key) != manifest[key] or not os.path.exists(os.path.join(self.directory, key + '.png')):
+                    self.render_tile(level, x, y, colors)
+                    redrawn += 1
+
+        # Tiles that no longer show any state
+        stale = [key for key in saved if key not in manifest]
+        for key in stale:
+            path = os.path.join(self.directory, key + '.png')
+            if os.path.exists(path):
+                os.remove(path)
+
+        os.makedirs(self.directory, exist_ok=True)
+        with open(os.path.join(self.directory, 'manifest.json'), 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, indent=0, sort_keys=True)
+        return redrawn, len(manifest) - redrawn, len(stale)
+
+
+def _assignment(text):
+    name, _, value = text.rpartition('=')
+    if not name:
+        raise argparse.ArgumentTypeError(f'expected STATE=VALUE, got {text!r}')
+    return name, float(value)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Render the US-states choropleth into a z/x/y tile pyramid.')
+    parser.add_argument('--zooms', type=int, default=6, help='highest zoom level (default: 6)')
+    parser.add_argument('--column', default='density', help='column of the geometry to colour by')
+    parser.add_argument('--set', type=_assignment, action='append', default=[], metavar='STATE=VALUE',
+                        help='override the value of a state (repeatable)')
+    parser.add_argument('--vmin', type=float, help='value at the bottom of the colour range (default: data minimum)')
+    parser.add_argument('--vmax', type=float, help='value at the top of the colour range (default: data maximum)')
+    parser.add_argument('--output', default=TILES_DIR, help=f'tile directory (default: {TILES_DIR})')
+    parser.add_argument('--force', action='store_true', help='redraw every tile')
+    args = parser.parse_args(argv)
+
+    import matplotlib
+    matplotlib.use('Agg')
+
+    states = load_states()
+    data = dict(zip(states['name'], states[args.column]))
+    data.update(args.set)
+
+    start = time.perf_counter()
+    pyramid = TilePyramid(states, zooms=range(args.zooms + 1), directory=args.output, vmin=args.vmin, vmax=args.vmax)
+    print(f'{len(pyramid.levels)} zoom levels indexed in {time.perf_counter() - start:.2f}s: ' +
+          ', '.join(f'z{level.z} {len(level.tiles)} tiles (tolerance {level.tolerance:g})' for level in pyramid.levels))
+
+    start = time.perf_counter()
+    redrawn, unchanged, removed = pyramid.render(data, force=args.force)
+    print(f'{redrawn} tiles redrawn, {unchanged} unchanged, {removed} removed in {time.perf_counter() - start:.2f}s '
+          f'-> {args.output}')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
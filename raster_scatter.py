@@ -0,0 +1,257 @@
+import sys
+import time
+
+import numpy as np
+from matplotlib.image import AxesImage
+
+from colormaps import ColorMapper
+from downsampling import pixel_size
+
+# Raster mode for scatter plots of very many points (SCATTER PLOT and SCATTER PLOT EXAMPLE of lesson_4.py).
+# Instead of one marker path per point, the points are accumulated into a canvas of the pixel size of the axes with
+# np.bincount, chunk by chunk: per pixel the summed marker size (size-weighted count) and the size-weighted sum of the
+# colour values. The canvas is shaded through the ColorMapper of colormaps.py (mean value per pixel, or the
+# count when there is no colour value) and drawn as one image in the axes, with a colorbar for the scale. The image is
+# shaded when the figure is drawn, from the canvas resampled to the pixel size the axes has then (a colorbar or
+# tight_layout shrinks the axes after the points were binned). Draw time and file size no longer depend on the number
+# of points, and 10^8 points are binned in seconds.
+#
+#   python raster_scatter.py 100000000       # energy vs. temperature, coloured by month; ax.scatter on 10^5 for scale
+
+DEFAULT_CHUNKSIZE = 10_000_000
+
+
+def _resample(grid, n, axis):
+    # grid with n pixels along axis. Shrinking adds every pixel into the new pixel that contains its centre, scaled by
+    # the ratio of the pixel sizes so that sums stay per pixel of the original grid; growing repeats the pixels.
+    old = grid.shape[axis]
+    if n == old:
+        return grid
+    if n < old:
+        target = ((np.arange(old) + 0.5) * (n / old)).astype(np.intp)
+        return np.add.reduceat(grid, np.searchsorted(target, np.arange(n)), axis=axis) * (n / old)
+    return np.take(grid, ((np.arange(n) + 0.5) * (old / n)).astype(np.intp), axis=axis)
+
+
+class PixelCanvas:
+
+    def __init__(self, extent, shape):
+        xmin, xmax, ymin, ymax = extent
+        self.extent = (float(xmin), float(xmax), float(ymin), float(ymax))
+        # (rows, columns) = (height, width) in pixels, row 0 at the bottom (imshow origin='lower')
+        self.shape = (int(shape[0]), int(shape[1]))
+        n_pixels = self.shape[0] * self.shape[1]
+        self.weight = np.zeros(n_pixels)
+        self.value = np.zeros(n_pixels)
+        self.count = 0
+
+    def pixels(self, x, y):
+        # Flat pixel index of every point; points outside the extent go to one extra index past the canvas
+        xmin, xmax, ymin, ymax = self.extent
+        height, width = self.shape
+        ix = np.floor((np.asarray(x, dtype=float) - xmin) * (width / (xmax - xmin)))
+        iy = np.floor((np.asarray(y, dtype=float) - ymin) * (height / (ymax - ymin)))
+        # The right and top edges belong to the last pixel
+        ix[ix == width] = width - 1
+        iy[iy == height] = height - 1
+        outside = (ix < 0) | (ix >= width) | (iy < 0) | (iy >= height) | np.isnan(ix) | np.isnan(iy)
+        flat = (iy * width + ix)
+        flat[outside] = height * width
+        return flat.astype(np.intp)
+
+    def add(self, x, y, values=None, sizes=None):
+        # Accumulate a chunk of points; sizes weight the points (marker areas), values are averaged per pixel
+        flat = self.pixels(x, y)
+        n = self.weight.size + 1
+        weights = None if sizes is None else np.broadcast_to(np.asarray(sizes, dtype=float), flat.shape)
+        self.weight += np.bincount(flat, weights=weights, minlength=n)[:-1]
+        if values is not None:
+            values = np.broadcast_to(np.asarray(values, dtype=float), flat.shape)
+            self.value += np.bincount(flat, weights=values if weights is None else values * weights, minlength=n)[:-1]
+        self.count += len(flat)
+        return self
+
+    def resampled(self, shape):
+        # Canvas of the same extent with another pixel size (see _resample): no pixel is dropped, and counts and sums
+        # keep the scale of this canvas
+        resampled = PixelCanvas(self.extent, shape)
+        for name in ('weight', 'value'):
+            grid = getattr(self, name).reshape(self.shape)
+            grid = _resample(_resample(grid, resampled.shape[0], 0), resampled.shape[1], 1)
+            setattr(resampled, name, grid.ravel())
+        resampled.count = self.count
+        return resampled
+
+    def _spread(self, grid, radius):
+        # Sum of every pixel's neighbourhood of the given radius (in pixels), so markers cover more than one pixel
+        if radius <= 0:
+            return grid
+        padded = np.pad(grid, radius)
+        spread = np.zeros_like(grid)
+        height, width = grid.shape
+        for dy in range(-radius, radius + 1):
+            for dx in range(-radius, radius + 1):
+                if dx * dx + dy * dy <= radius * radius:
+                    spread += padded[radius + dy:radius + dy + height, radius + dx:radius + dx + width]
+        return spread
+
+    def aggregate(self, how='mean', spread=0):
+        # (height x width) grid: 'count' (size-weighted), 'sum' or 'mean' of the values; NaN where there is no point
+        weight = self._spread(self.weight.reshape(self.shape), spread)
+        if how == 'count':
+            grid = weight
+        elif how in ('sum', 'mean'):
+            grid = self._spread(self.value.reshape(self.shape), spread)
+            if how == 'mean':
+                with np.errstate(invalid='ignore', divide='ignore'):
+                    grid = grid / weight
+        else:
+            raise ValueError(f"how must be 'count', 'sum' or 'mean', not {how!r}")
+        return np.where(weight > 0, grid, np.nan)
+
+    def shade(self, mapper, how='mean', spread=0, alpha=1.0):
+        # uint8 RGBA image of the canvas through a ColorMapper; pixels without points are transparent
+        grid = self.aggregate(how, spread)
+        empty = np.isnan(grid)
+        rgba = mapper.rgba(grid.ravel()).reshape(grid.shape + (4,))
+        rgba[..., 3] = np.where(empty, 0, np.round(rgba[..., 3] * alpha)).astype(np.uint8)
+        return rgba
+
+
+class CanvasImage(AxesImage):
+    # Image of a PixelCanvas, shaded again whenever the canvas extent covers another number of pixels when the figure
+    # is drawn (layout changes, savefig at another dpi), so that imshow's 'nearest' resampling drops no canvas pixels
+
+    def __init__(self, ax, canvas, mapper, how='mean', spread=0, alpha=1.0, **kwargs):
+        super().__init__(ax, origin='lower', interpolation='nearest', extent=canvas.extent, **kwargs)
+        self.canvas = canvas
+        self.shading = (mapper, how, spread, alpha)
+        self._shape = canvas.shape
+        self.set_data(canvas.shade(*self.shading))
+
+    def pixel_shape(self):
+        # (height, width) in display pixels of the canvas extent
+        xmin, xmax, ymin, ymax = self.canvas.extent
+        (x0, y0), (x1, y1) = self.axes.transData.transform([(xmin, ymin), (xmax, ymax)])
+        return max(int(round(abs(y1 - y0))), 1), max(int(round(abs(x1 - x0))), 1)
+
+    def draw(self, renderer):
+        shape = self.pixel_shape()
+        if shape != self._shape:
+            self._shape = shape
+            self.set_data(self.canvas.resampled(shape).shade(*self.shading))
+        super().draw(renderer)
+
+
+class RasterScatter:
+    # What raster_scatter() drew: the canvas, the image artist and the colour mapping (for the colorbar)
+
+    def __init__(self, canvas, image, mapper):
+        self.canvas = canvas
+        self.image = image
+        self.mapper = mapper
+
+    def colorbar(self, fig=None, **kwargs):
+        return self.mapper.colorbar(fig, self.image.axes, **kwargs)
+
+
+def _chunks(arrays, chunksize):
+    n = len(arrays[0])
+    for start in range(0, n, chunksize):
+        # None and scalars (one size or colour for every point) are passed on as they are, add() broadcasts them
+        yield [a if a is None or np.ndim(a) == 0 else a[start:start + chunksize] for a in arrays]
+
+
+def raster_scatter(ax, x=None, y=None, s=None, c=None, chunks=None, cmap='viridis', norm=None, vmin=None, vmax=None,
+                   how=None, spread=0, alpha=1.0, shape=None, chunksize=DEFAULT_CHUNKSIZE, **kwargs):
+    # Raster version of ax.scatter(x, y, s=s, c=c, cmap=cmap, vmin=vmin, vmax=vmax, alpha=alpha). The axes limits are
+    # used as the canvas extent (set them first, or they are taken from the data); points may also come from an
+    # iterable of (x, y, s, c) chunks. how defaults to 'mean' of c, or the size-weighted 'count' without c.
+    from matplotlib.colors import LogNorm
+
+    if chunks is None:
+        x, y = np.asarray(x), np.asarray(y)
+        if ax.get_autoscalex_on() and len(x):
+            ax.set_xlim(np.nanmin(x), np.nanmax(x))
+        if ax.get_autoscaley_on() and len(y):
+            ax.set_ylim(np.nanmin(y), np.nanmax(y))
+        chunks = _chunks([x, y, s, c], chunksize)
+
+    xmin, xmax = ax.get_xlim()
+    ymin, ymax = ax.get_ylim()
+    width, height = pixel_size(ax)
+    canvas = PixelCanvas((xmin, xmax, ymin, ymax), shape or (height, width))
+    colored = None
+    for cx, cy, cs, cc in chunks:
+        canvas.add(cx, cy, cc, cs)
+        colored = cc is not None
+    how = how or ('mean' if colored else 'count')
+
+    if norm is None and how == 'count':
+        # Counts span orders of magnitude: a log scale, as datashader uses by default
+        weight = canvas.weight[canvas.weight > 0]
+        norm = LogNorm(vmin if vmin is not None else (weight.min() if len(weight) else 1),
+                       vmax if vmax is not None else (weight.max() if len(weight) else 10))
+    # The norm is fitted to the aggregated pixels when vmin / vmax are not given
+    mapper = ColorMapper(cmap, vmin, vmax, norm=norm)
+
+    image = CanvasImage(ax, canvas, mapper, how, spread, alpha, **kwargs)
+    ax.set_aspect('auto')
+    ax.add_image(image)
+    ax.set_xlim(xmin, xmax)
+    ax.set_ylim(ymin, ymax)
+    return RasterScatter(canvas, image, mapper)
+
+
+# DEMO -----------------------------------------------------------------------------------------------------------------
+
+def energy_readings(n, chunksize=DEFAULT_CHUNKSIZE, seed=42):
+    # (temperature, energy, size, month) chunks with the distribution of the lesson's synthetic data
+    rng = np.random.default_rng(seed)
+    for start in range(0, n, chunksize):
+        m = min(chunksize, n - start)
+        temperature = rng.uniform(5, 30, m)
+        yield temperature, temperature * 15 + rng.normal(0, 10, m), None, rng.integers(1, 13, m).astype(float)
+
+
+def _energy_axes(figsize=(12, 6)):
+    import matplotlib.pyplot as plt
+
+    fig, ax = plt.subplots(figsize=figsize)
+    ax.set(xlim=(0, 35), ylim=(0, 550))
+    ax.set_title('Energy Consumption vs. Average Temperature', fontsize=18)
+    ax.set_xlabel('Average Temperature [°C]', fontsize=14)
+    ax.set_ylabel('Energy Consumption [kWh]', fontsize=14)
+    return fig, ax
+
+
+if __name__ == '__main__':
+    import io
+
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_CHUNKSIZE
+    output = sys.argv[2] if len(sys.argv) > 2 else 'Graphs/energy_consumption_raster.png'
+
+    sample = min(n, 100_000)
+    x, y, _, month = next(energy_readings(sample, chunksize=sample))
+    for name, draw in (('ax.scatter', lambda ax: ax.scatter(x, y, c=month, cmap='viridis', s=4)),
+                       ('raster_scatter', lambda ax: raster_scatter(ax, x, y, c=month, cmap='viridis'))):
+        fig, ax = _energy_axes()
+        start = time.perf_counter()
+        draw(ax)
+        buffer = io.BytesIO()
+        fig.savefig(buffer, format='pdf')
+        plt.close(fig)
+        print(f'{sample:>12,} points, {name:<15} {time.perf_counter() - start:6.2f}s, '
+              f'PDF {buffer.tell() / 1e6:6.1f} MB')
+
+    fig, ax = _energy_axes()
+    start = time.perf_counter()
+    drawn = raster_scatter(ax, chunks=energy_readings(n), cmap='viridis', vmin=1, vmax=12)
+    drawn.colorbar(fig, label='Month')
+    fig.tight_layout()
+    fig.savefig(output, bbox_inches='tight')
+    print(f'{drawn.canvas.count:>12,} points, raster_scatter  {time.perf_counter() - start:6.2f}s -> {output}')
@@ -0,0 +1,149 @@
+import argparse
+import os
+import sys
+import time
+import traceback
+import warnings
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import figures
+
+# Regenerate every figure in Graphs/ without opening a window.
+# Each figure function of the lesson scripts (see figures.py) is called on its own, on the Agg backend, in a pool of
+# processes.
+#
+#   python render_all.py                  # all figures, one worker per core
+#   python render_all.py -j 4 hexbin      # only the figures whose name (or lesson) contains "hexbin"
+#   python render_all.py --list           # show the figures that would be rendered
+#   python render_all.py --trace t.json   # also record timing spans (see tracing.py)
+#   python render_all.py --format webp    # export format and compression (see export.py)
+#   python render_all.py --export-queue 4 # encode and write the files in the background (see export.ExportQueue)
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+
+# HEADLESS WORKER ------------------------------------------------------------------------------------------------------
+
+def _init_worker(trace=False, trace_memory=False, export_queue=0):
+    # Select Agg before pyplot is imported anywhere in the worker
+    os.environ['MPLBACKEND'] = 'Agg'
+    import matplotlib
+    matplotlib.use('Agg')
+    warnings.filterwarnings('ignore', message='.*non-interactive.*')
+    os.chdir(ROOT)
+    if trace:
+        import tracing
+        tracing.enable(memory=trace_memory)
+    if export_queue:
+        # Files still queued when the worker exits are written before it ends (the writer threads are joined)
+        import export
+        export.start_queue(max_pending=export_queue)
+
+
+def render_figure(name):
+    import export
+    import tracing
+
+    start = time.perf_counter()
+    error = None
+    # The file the figure is saved to under the export settings of the worker, until savefig says otherwise (the
+    # paths saved by the previous figure of this worker are dropped)
+    label = export.output_path(figures.output(name))
+    export.saved()
+    try:
+        with tracing.figure(label):
+            figures.render(name)
+    except Exception:
+        error = traceback.format_exc(limit=-3)
+    # Finish the background writes of this figure before it is reported, so that a failed write is reported with the
+    # figure that queued it (the last figure of a worker included)
+    try:
+        export.flush()
+    except RuntimeError as exception:
+        error = (error or '') + f'{exception}\n'
+    # Reported under the paths export.savefig returned (a figure may save more than one file), the spans recorded in
+    # this worker as well (an empty list unless tracing was enabled)
+    output = ', '.join(export.saved()) or label
+    spans = tracing.collect()
+    for span in spans:
+        if span['args']['figure'] == label:
+            span['args']['figure'] = output
+        if span['cat'] == 'figure' and span['name'] == label:
+            span['name'] = output
+    return name, output, time.perf_counter() - start, error, spans
+
+
+# BATCH ----------------------------------------------------------------------------------------------------------------
+
+def render_all(names, jobs=None, report=print, trace=None, trace_memory=False, export_queue=0):
+    os.chdir(ROOT)
+    if not os.path.exists('Graphs'):
+        os.makedirs('Graphs')
+
+    timings = {}
+    failures = {}
+    events = []
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=jobs, initializer=_init_worker,
+                             initargs=(trace is not None, trace_memory, export_queue)) as pool:
+        futures = [pool.submit(render_figure, name) for name in names]
+        for future in as_completed(futures):
+            name, output, seconds, error, spans = future.result()
+            events.extend(spans)
+            timings[output] = seconds
+            status = 'ok' if error is None else 'FAILED'
+            report(f'{seconds:8.2f}s  {status:6}  {output:<58} {figures.location(name)}')
+            if error is not None:
+                failures[output] = error
+    wall = time.perf_counter() - start
+
+    report(f'{len(names)} figures in {wall:.2f}s wall time '
+           f'({sum(timings.values()):.2f}s of rendering, {jobs or os.cpu_count()} workers)')
+    for output, error in failures.items():
+        report(f'\n{output}:\n{error}')
+
+    if trace is not None:
+        import tracing
+        tracing.write(trace, events)
+        report(f'\n{len(events)} spans written to {trace}; slowest stages:')
+        for (figure, name), seconds in tracing.summary(events)[:10]:
+            report(f'{seconds:8.3f}s  {name:<32} {figure}')
+    return timings, failures
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Render the lesson figures headless into Graphs/.')
+    parser.add_argument('patterns', nargs='*',
+                        help='only render the figures or lessons whose name contains one of these')
+    parser.add_argument('-j', '--jobs', type=int, default=None, help='number of worker processes (default: all cores)')
+    parser.add_argument('--list', action='store_true', help='list the figures and exit')
+    parser.add_argument('--trace', metavar='PATH',
+                        help='record timing spans into a Chrome trace file (.json) or a JSON log (.jsonl)')
+    parser.add_argument('--trace-memory', action='store_true', help='also record allocations in the spans (slower)')
+    parser.add_argument('--format', choices=['png', 'webp', 'svg', 'pdf'],
+                        help='output format (default: as in the scripts)')
+    parser.add_argument('--compress-level', type=int, help='0 (fastest) to 9 (smallest); default: encoder default')
+    parser.add_argument('--export-queue', type=int, default=0, metavar='N',
+                        help='write PNG/WebP files in the background, at most N figures waiting per worker')
+    args = parser.parse_args(argv)
+
+    # Read by export.py in the worker processes
+    if args.format:
+        os.environ['EXPORT_FORMAT'] = args.format
+    if args.compress_level is not None:
+        os.environ['EXPORT_COMPRESS_LEVEL'] = str(args.compress_level)
+
+    names = figures.select(args.patterns)
+    if args.list:
+        import export
+        for name in names:
+            print(f'{export.output_path(figures.output(name), args.format):<58} {figures.location(name)}')
+        return 0
+
+    _, failures = render_all(names, jobs=args.jobs, trace=args.trace, trace_memory=args.trace_memory,
+                             export_queue=args.export_queue)
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
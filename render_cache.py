@@ -0,0 +1,162 @@
+import hashlib
+import json
+import os
+import shutil
+
+import matplotlib
+
+# Content-addressed cache of rendered figures.
+# The key is a hash of the input data, the plotting function (its code and literal parameters), its keyword parameters,
+# any other functions it depends on, the matplotlib version and the active style. On a hit the cached file is copied
+# to the output path and neither the figure nor savefig is run. The cache directory is kept under MAX_BYTES by evicting
+# the least recently used renders.
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+CACHE_DIR = os.path.join(ROOT, '.cache', 'renders')
+MAX_BYTES = 64 * 1024 * 1024
+
+# rcParams that do not change what ends up in the file
+IGNORED_RC = {'backend', 'backend_fallback', 'interactive'}
+
+
+# KEYS -----------------------------------------------------------------------------------------------------------------
+
+def _update(digest, obj):
+    # Feed a canonical, type-tagged representation of obj into the hash
+    if isinstance(obj, dict):
+        digest.update(b'{')
+        for k in sorted(obj, key=repr):
+            _update(digest, k)
+            _update(digest, obj[k])
+        digest.update(b'}')
+    elif isinstance(obj, (list, tuple)):
+        digest.update(b'[' if isinstance(obj, list) else b'(')
+        for item in obj:
+            _update(digest, item)
+        digest.update(b']')
+    elif hasattr(obj, '__code__'):
+        _update_code(digest, obj.__code__)
+    elif hasattr(obj, 'to_numpy') and hasattr(obj, 'columns'):
+        # pandas DataFrame
+        _update(digest, list(map(str, obj.columns)))
+        for column in obj.columns:
+            _update(digest, obj[column].to_numpy())
+    elif hasattr(obj, 'dtype') and hasattr(obj, 'tobytes'):
+        # numpy array
+        if obj.dtype == object:
+            _update(digest, obj.tolist())
+        else:
+            digest.update(f'<{obj.dtype.str}{obj.shape}>'.encode())
+            digest.update(obj.tobytes())
+    else:
+        digest.update(f'{type(obj).__name__}:{obj!r};'.encode())
+
+
+def _update_code(digest, code):
+    # Bytecode, names and literals (figsize, colors, titles, ...) of a function, including nested functions
+    digest.update(code.co_code)
+    _update(digest, code.co_names)
+    for const in code.co_consts:
+        if hasattr(const, 'co_code'):
+            _update_code(digest, const)
+        else:
+            _update(digest, const)
+
+
+def style_fingerprint():
+    rc = {k: v for k, v in matplotlib.rcParams.items() if k not in IGNORED_RC}
+    return json.dumps(rc, sort_keys=True, default=repr)
+
+
+def make_key(*inputs, **params):
+    digest = hashlib.sha256()
+    _update(digest, matplotlib.__version__)
+    _update(digest, style_fingerprint())
+    _update(digest, inputs)
+    _update(digest, params)
+    return digest.hexdigest()
+
+
+# CACHE ----------------------------------------------------------------------------------------------------------------
+
+def _cached_path(key, output, cache_dir):
+    return os.path.join(cache_dir, key + os.path.splitext(output)[1])
+
+
+def restore(key, output, cache_dir=CACHE_DIR):
+    cached = _cached_path(key, output, cache_dir)
+    if not os.path.exists(cached):
+        return False
+
+    # Mark as recently used, then put it where the figure would have been saved
+    os.utime(cached)
+    os.makedirs(os.path.dirname(output) or '.', exist_ok=True)
+    shutil.copyfile(cached, output)
+    return True
+
+
+def store(key, output, cache_dir=CACHE_DIR, max_bytes=MAX_BYTES):
+    os.makedirs(cache_dir, exist_ok=True)
+    shutil.copyfile(output, _cached_path(key, output, cache_dir))
+    evict(cache_dir, max_bytes)
+
+
+def _size(path):
+    # Bytes of a file, or of all the files under a directory
+    if not os.path.isdir(path):
+        return os.path.getsize(path)
+    return sum(os.path.getsize(os.path.join(folder, name)) for folder, _, names in os.walk(path) for name in names)
+
+
+def evict(cache_dir=CACHE_DIR, max_bytes=MAX_BYTES):
+    # Entries of cache_dir are files or directories (one entry each, used as of their own mtime)
+    if not os.path.isdir(cache_dir):
+        return []
+
+    # Least recently used first
+    entries = []
+    for name in os.listdir(cache_dir):
+        path = os.path.join(cache_dir, name)
+        entries.append((os.stat(path).st_mtime, _size(path), name))
+    entries.sort()
+
+    total = sum(size for _, size, _ in entries)
+    removed = []
+    for _, size, name in entries:
+        if total <= max_bytes:
+            break
+        path = os.path.join(cache_dir, name)
+        if os.path.isdir(path):
+            shutil.rmtree(path, ignore_errors=True)
+        else:
+            os.remove(path)
+        total -= size
+        removed.append(name)
+    return removed
+
+
+def clear(cache_dir=CACHE_DIR):
+    shutil.rmtree(cache_dir, ignore_errors=True)
+
+
+# RENDER ---------------------------------------------------------------------------------------------------------------
+
+def render(output, plot, *inputs, depends=(), **params):
+    # plot(output, *inputs, **params) builds the figure and saves it to output; it is only called on a cache miss.
+    # depends lists the helpers plot() calls (their code is part of the key, they are not passed to plot).
+    # Returns True when the figure was rendered, False when it came from the cache.
+    import export
+
+    # The export format and compression decide which file plot() writes, and its bytes
+    output = export.output_path(output)
+    key = make_key(plot, *inputs, depends=tuple(depends), export=export.settings(), **params)
+    if restore(key, output):
+        export.record(output)
+        return False
+
+    plot(output, *inputs, **params)
+    # With a background export queue the file may not be written yet. A failed write is not cached; it is reported
+    # through export.failures().
+    if export.wait(output):
+        store(key, output)
+    return True
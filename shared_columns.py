@@ -0,0 +1,239 @@
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import sys
+import time
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+# Hand-off of a prepared city table from data prep to parallel render workers (variants of the lesson_3 charts).
+# publish() writes every column once as a .npy file under .cache/columns/<content hash>: numeric and boolean columns as
+# they are, text columns as integer codes (MISSING for a missing value) plus a fixed-width array of their distinct
+# values. Workers receive only a small ColumnSet handle and attach to the files with memory mapping, so the columns are
+# read zero-copy from the page cache that all processes share: fanning out over cores neither parses the data again
+# nor multiplies its memory. The workers compute on the mapped arrays themselves and only put chunks of rows into
+# pandas; text is decoded only for the rows that end up on a chart. The published tables are kept under MAX_BYTES by
+# evicting the least recently published or reused ones; unpublish() removes one, clear() all of them.
+#
+#   python shared_columns.py --rows 2000000 -j 4    # publish a synthetic table, render FILTERING / SORTING variants
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+CACHE_DIR = os.path.join(ROOT, '.cache', 'columns')
+MAX_BYTES = 1024 * 1024 * 1024
+VARIANTS_DIR = os.path.join('Graphs', 'variants')
+MAX_BARS = 30
+CHUNKSIZE = 1_000_000
+
+# Code of a missing value in a text column
+MISSING = -1
+
+# directory: folder of the .npy files, columns: {name: dtype}, text: names of the columns stored as codes
+ColumnSet = namedtuple('ColumnSet', ['directory', 'columns', 'text', 'rows'])
+
+
+# PUBLISH / ATTACH -----------------------------------------------------------------------------------------------------
+
+def _encoded(series):
+    # (values, distinct values) of a column: codes and a fixed-width string array for text and categorical columns
+    # (pandas codes a missing value as -1, which is MISSING). Boolean columns count as numeric.
+    if pd.api.types.is_numeric_dtype(series.dtype):
+        return series.to_numpy(), None
+    categorical = series.astype('category').array
+    return np.asarray(categorical.codes), np.asarray(categorical.categories, dtype=str)
+
+
+def publish(df, cache_dir=CACHE_DIR):
+    # Write the columns of df once (reused when the same table was published before) and return the handle
+    from render_cache import evict
+
+    encoded = {column: _encoded(df[column]) for column in df.columns}
+    digest = hashlib.sha256()
+    for column, (values, categories) in encoded.items():
+        digest.update(f'{column}:{values.dtype.str};'.encode())
+        digest.update(np.ascontiguousarray(values).tobytes())
+        if categories is not None:
+            digest.update(categories.tobytes())
+    directory = os.path.join(cache_dir, digest.hexdigest()[:32])
+
+    manifest = os.path.join(directory, 'manifest.json')
+    if os.path.exists(manifest):
+        # Mark as recently used (the cache is evicted least recently used first)
+        os.utime(directory)
+    else:
+        # Room is made before writing: the table being published has to stay for the workers that attach to it
+        evict(cache_dir, MAX_BYTES)
+        os.makedirs(directory, exist_ok=True)
+        for i, (values, categories) in enumerate(encoded.values()):
+            np.save(os.path.join(directory, f'{i}.npy'), values)
+            if categories is not None:
+                np.save(os.path.join(directory, f'{i}.categories.npy'), categories)
+        with open(manifest, 'w', encoding='utf-8') as f:
+            # Written last: a directory without a manifest is an interrupted publish
+            json.dump({'columns': {column: values.dtype.str for column, (values, _) in encoded.items()},
+                       'text': [column for column, (_, categories) in encoded.items() if categories is not None],
+                       'rows': len(df)}, f)
+
+    with open(manifest, encoding='utf-8') as f:
+        saved = json.load(f)
+    return ColumnSet(directory, saved['columns'], saved['text'], saved['rows'])
+
+
+def unpublish(handle):
+    # Remove the files of a published table (arrays that are already mapped stay readable)
+    shutil.rmtree(handle.directory, ignore_errors=True)
+
+
+def clear(cache_dir=CACHE_DIR):
+    # Remove every published table
+    shutil.rmtree(cache_dir, ignore_errors=True)
+
+
+def _path(handle, column, suffix='.npy'):
+    return os.path.join(handle.directory, f'{list(handle.columns).index(column)}{suffix}')
+
+
+def attach(handle, columns=None):
+    # Read-only memory-mapped arrays of the published columns: {name: array}, text columns as codes
+    return {column: np.load(_path(handle, column), mmap_mode='r') for column in (columns or handle.columns)}
+
+
+def frame(handle, columns=None):
+    # DataFrame over the memory-mapped columns (text columns hold their codes). Raises when pandas copied a column
+    # into a block of its own (older versions consolidate the columns of one dtype), which would read the whole column
+    # into this process.
+    arrays = attach(handle, columns)
+    df = pd.DataFrame(arrays, copy=False)
+    copied = [column for column, values in arrays.items() if not np.shares_memory(df[column].to_numpy(), values)]
+    if copied:
+        raise RuntimeError(f'pandas {pd.__version__} copied the mapped column(s) {", ".join(copied)}; '
+                           f'use attach() for the arrays')
+    return df
+
+
+def decode(handle, column, codes):
+    # Text values of a few codes of a text column (None for MISSING)
+    codes = np.asarray(codes, dtype=np.intp)
+    categories = np.load(_path(handle, column, '.categories.npy'), mmap_mode='r')
+    found = codes != MISSING
+    values = np.full(len(codes), None, dtype=object)
+    values[found] = categories[codes[found]]
+    return values
+
+
+# VARIANT FAN-OUT ------------------------------------------------------------------------------------------------------
+
+# kind: 'filter' (FILTERING with threshold `value`) or 'top' (SORTING restricted to the `value` largest cities)
+Variant = namedtuple('Variant', ['kind', 'value'])
+
+_handle = None
+_columns = None
+
+
+def _attach_worker(handle):
+    global _handle, _columns
+    import matplotlib
+    matplotlib.use('Agg')
+    os.chdir(ROOT)
+    _handle = handle
+    _columns = attach(handle)
+
+
+def _private_memory():
+    # Memory written by this process only, in bytes (mapped columns and pages inherited from the parent are not
+    # counted); None where /proc is not available
+    try:
+        with open('/proc/self/smaps_rollup', encoding='utf-8') as f:
+            for line in f:
+                if line.startswith('Private_Dirty:'):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        return None
+
+
+def _chunks(columns, names, chunksize=CHUNKSIZE):
+    # DataFrames over consecutive slices of the mapped columns: pandas holds one chunk of rows at a time
+    rows = len(columns[names[0]])
+    for start in range(0, rows, chunksize):
+        yield pd.DataFrame({name: columns[name][start:start + chunksize] for name in names}, copy=False)
+
+
+def _largest_cities(handle, columns, k):
+    from city_pipeline import top_k
+
+    shown = top_k(_chunks(columns, ['City', 'Population']), k)
+    shown['City'] = decode(handle, 'City', shown['City'])
+    return shown
+
+
+def render_variant(variant, handle=None):
+    # Render one variant from the attached columns; returns (output path, matching rows, seconds, worker memory)
+    import matplotlib.pyplot as plt
+    import export
+    from city_pipeline import plot_filtered, plot_top_k
+
+    if handle is None:
+        handle, columns = _handle, _columns
+    else:
+        columns = attach(handle)
+    start = time.perf_counter()
+    fig, ax = plt.subplots(figsize=(15, 6))
+    if variant.kind == 'filter':
+        # Matches are counted on the whole table, the chart shows the largest cities
+        matches = int((columns['Population'] > variant.value).sum())
+        shown = _largest_cities(handle, columns, MAX_BARS)
+        plot_filtered(ax, shown, shown['Population'].to_numpy() > variant.value, variant.value)
+    elif variant.kind == 'top':
+        shown = _largest_cities(handle, columns, variant.value)
+        matches = len(shown)
+        plot_top_k(ax, shown)
+    else:
+        raise ValueError(f'unknown variant kind {variant.kind!r}')
+
+    output = export.savefig(os.path.join(VARIANTS_DIR, f'{variant.kind}_{variant.value:g}.png'), fig=fig)
+    plt.close(fig)
+    return output, matches, time.perf_counter() - start, _private_memory()
+
+
+def render_variants(handle, variants, jobs=None, report=print):
+    # Fan the variants out over a pool of processes that each attach to the published columns once
+    os.makedirs(os.path.join(ROOT, VARIANTS_DIR), exist_ok=True)
+    results = []
+    with ProcessPoolExecutor(max_workers=jobs, initializer=_attach_worker, initargs=(handle,)) as pool:
+        for variant, (output, matches, seconds, memory) in zip(variants, pool.map(render_variant, variants)):
+            memory = f'{memory / 1e6:7.1f} MB private' if memory is not None else ''
+            report(f'{seconds:6.2f}s  {output:<40} {matches:>10,} rows  {memory}')
+            results.append((variant, output, matches))
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Render lesson_3 chart variants from columns shared with workers.')
+    parser.add_argument('--rows', type=int, default=1_000_000, help='rows of the synthetic city table')
+    parser.add_argument('-j', '--jobs', type=int, default=None, help='number of worker processes (default: all cores)')
+    parser.add_argument('--thresholds', type=float, nargs='*', default=[1e6, 3e6, 5e6, 8e6])
+    parser.add_argument('--top', type=int, nargs='*', default=[5, 10, 20])
+    args = parser.parse_args(argv)
+
+    rng = np.random.default_rng(0)
+    names = [f'City {i}' for i in range(args.rows)]
+    df = pd.DataFrame({'City': names, 'Population': rng.integers(100_000, 9_000_000, args.rows),
+                       'Area (sq mi)': rng.uniform(50, 700, args.rows)})
+
+    start = time.perf_counter()
+    handle = publish(df)
+    print(f'{args.rows:,} rows published to {handle.directory} in {time.perf_counter() - start:.2f}s')
+
+    variants = [Variant('filter', value) for value in args.thresholds] + [Variant('top', n) for n in args.top]
+    start = time.perf_counter()
+    render_variants(handle, variants, jobs=args.jobs)
+    print(f'{len(variants)} variants in {time.perf_counter() - start:.2f}s')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
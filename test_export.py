@@ -0,0 +1,67 @@
+import time
+
+import matplotlib
+matplotlib.use('Agg')
+import matplotlib.pyplot as plt
+import pytest
+
+import export
+import render_cache
+
+
+def _figure():
+    fig, ax = plt.subplots(figsize=(2, 1))
+    ax.plot([0, 1], [0, 1])
+    return fig
+
+
+def _written(queue, timeout=10):
+    # Wait until the writer threads are done, without going through wait() or flush()
+    deadline = time.monotonic() + timeout
+    while queue.pending() and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+
+@pytest.fixture
+def figure():
+    fig = _figure()
+    yield fig
+    plt.close(fig)
+
+
+def test_wait_reports_a_write_that_already_failed(tmp_path, figure):
+    # The output path is a directory: the write fails, and has failed before wait() is called
+    output = tmp_path / 'figure.png'
+    output.mkdir()
+    with export.ExportQueue() as queue:
+        queue.savefig(str(output), fig=figure, cache_dir=str(tmp_path / 'layouts'))
+        _written(queue)
+        assert not queue.wait(str(output))
+        assert [path for path, _ in queue.failures()] == [str(output)]
+        # The outcome was reported once; a later write of the path starts afresh
+        output.rmdir()
+        queue.savefig(str(output), fig=figure, cache_dir=str(tmp_path / 'layouts'))
+        assert queue.wait(str(output))
+        assert output.is_file()
+
+
+def test_render_cache_does_not_store_a_failed_write(tmp_path, monkeypatch):
+    output = tmp_path / 'figure.png'
+    output.mkdir()
+    stored = []
+    monkeypatch.setattr(render_cache, 'restore', lambda key, path: False)
+    monkeypatch.setattr(render_cache, 'store', lambda key, path: stored.append(path))
+
+    def plot(path):
+        fig = _figure()
+        export.savefig(path, fig=fig, cache_dir=str(tmp_path / 'layouts'))
+        plt.close(fig)
+        _written(export._queue)
+
+    export.start_queue()
+    try:
+        assert render_cache.render(str(output), plot)
+        assert stored == []
+    finally:
+        export.failures()
+        export.stop_queue()
@@ -0,0 +1,230 @@
+import functools
+import json
+import os
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager, nullcontext
+
+# Timing (and optionally allocation) spans around the stages that make a figure slow: pandas groupby / merge /
+# sort_values, matplotlib artist creation, tight_layout, the figure draw and PNG encoding in savefig.
+# Nothing is patched until enable() is called, so scripts that never enable tracing run the original functions.
+# Every span carries the name of the figure being built and the number of input rows of the call. write() saves the
+# spans as a Chrome trace (open it in chrome://tracing or ui.perfetto.dev) or, for a .jsonl path, one JSON object per
+# line.
+#
+#   python render_all.py --trace Graphs/trace.json        # spans of every lesson figure
+#
+#   import tracing
+#   tracing.enable(memory=True)
+#   with tracing.figure('Graphs/sorting.png'):
+#       ...
+#   tracing.write('trace.json')
+
+# (module, attribute path, category); the wrapped callables are looked up when tracing is enabled
+TARGETS = [
+    ('pandas', 'merge', 'pandas'),
+    ('pandas', 'DataFrame.merge', 'pandas'),
+    ('pandas', 'DataFrame.sort_values', 'pandas'),
+    ('pandas', 'Series.sort_values', 'pandas'),
+    ('pandas.core.groupby.groupby', 'GroupBy.sum', 'pandas'),
+    ('pandas.core.groupby.groupby', 'GroupBy.mean', 'pandas'),
+    ('pandas.core.groupby.groupby', 'GroupBy.median', 'pandas'),
+    ('pandas.core.groupby.groupby', 'GroupBy.count', 'pandas'),
+    ('pandas.core.groupby.groupby', 'GroupBy.size', 'pandas'),
+    ('pandas.core.groupby.generic', 'DataFrameGroupBy.agg', 'pandas'),
+    ('pandas.core.groupby.generic', 'DataFrameGroupBy.aggregate', 'pandas'),
+    ('pandas.core.groupby.generic', 'SeriesGroupBy.agg', 'pandas'),
+    ('pandas.core.groupby.generic', 'SeriesGroupBy.aggregate', 'pandas'),
+    ('pandas.plotting', 'PlotAccessor.__call__', 'artists'),
+    ('geopandas.plotting', 'GeoplotAccessor.__call__', 'artists'),
+    ('matplotlib.axes', 'Axes.plot', 'artists'),
+    ('matplotlib.axes', 'Axes.bar', 'artists'),
+    ('matplotlib.axes', 'Axes.scatter', 'artists'),
+    ('matplotlib.axes', 'Axes.hist2d', 'artists'),
+    ('matplotlib.axes', 'Axes.hexbin', 'artists'),
+    ('matplotlib.axes', 'Axes.stackplot', 'artists'),
+    ('matplotlib.axes', 'Axes.tripcolor', 'artists'),
+    ('matplotlib.axes', 'Axes.pcolormesh', 'artists'),
+    ('matplotlib.axes', 'Axes.text', 'artists'),
+    ('matplotlib.axes', 'Axes.legend', 'artists'),
+    ('matplotlib.figure', 'Figure.colorbar', 'artists'),
+    ('matplotlib.figure', 'Figure.tight_layout', 'layout'),
+    ('matplotlib.figure', 'Figure.savefig', 'savefig'),
+    ('matplotlib.figure', 'Figure.draw', 'draw'),
+    ('matplotlib.backends.backend_agg', 'FigureCanvasAgg.print_png', 'encode'),
+    ('render_cache', 'restore', 'cache'),
+]
+
+_events = []
+_patched = []
+_memory = False
+_local = threading.local()
+
+
+def enabled():
+    return bool(_patched)
+
+
+# SPANS ----------------------------------------------------------------------------------------------------------------
+
+def _rows(obj):
+    # Input size of a call: rows of a DataFrame / groupby, length of the first array argument
+    if hasattr(obj, 'obj') and hasattr(obj, 'ngroups'):
+        obj = obj.obj
+    obj = getattr(obj, '_parent', obj)
+    if hasattr(obj, 'shape') and len(getattr(obj, 'shape', ())):
+        return int(obj.shape[0])
+    if isinstance(obj, (list, tuple)):
+        return len(obj)
+    return None
+
+
+def _stack():
+    if not hasattr(_local, 'stack'):
+        _local.stack = []
+    return _local.stack
+
+
+@contextmanager
+def span(name, category='figure', rows=None, **args):
+    context = getattr(_local, 'figure', None)
+    if context is not None and rows is not None:
+        context['rows'] = max(context['rows'] or 0, rows)
+
+    stack = _stack()
+    frame = {'peak': 0}
+    if _memory:
+        # Peaks are reset for each span; the parent keeps the highest peak seen so far
+        current, peak = tracemalloc.get_traced_memory()
+        if stack:
+            stack[-1]['peak'] = max(stack[-1]['peak'], peak)
+        tracemalloc.reset_peak()
+        frame['start'] = current
+    stack.append(frame)
+
+    start = time.perf_counter_ns()
+    try:
+        yield
+    finally:
+        duration = time.perf_counter_ns() - start
+        stack.pop()
+        event = {'name': name, 'cat': category, 'ph': 'X', 'ts': start / 1000, 'dur': duration / 1000,
+                 'pid': os.getpid(), 'tid': threading.get_native_id(),
+                 'args': {'figure': context['name'] if context else None,
+                          'rows': rows if rows is not None else (context['rows'] if context else None), **args}}
+        if _memory:
+            current, peak = tracemalloc.get_traced_memory()
+            peak = max(peak, frame['peak'])
+            if stack:
+                stack[-1]['peak'] = max(stack[-1]['peak'], peak)
+            event['args']['allocated_bytes'] = current - frame['start']
+            event['args']['peak_bytes'] = peak - frame['start']
+        _events.append(event)
+
+
+def figure(name, rows=None):
+    # Span covering one figure; the spans inside it are tagged with its name. A no-op while tracing is disabled.
+    if not _patched:
+        return nullcontext()
+    return _figure(name, rows)
+
+
+@contextmanager
+def _figure(name, rows):
+    previous = getattr(_local, 'figure', None)
+    _local.figure = {'name': name, 'rows': rows}
+    try:
+        with span(name, 'figure', rows=rows):
+            yield
+    finally:
+        _local.figure = previous
+
+
+def _wrap(fn, name, category):
+    @functools.wraps(fn)
+    def traced(*args, **kwargs):
+        # Methods report the rows of self (DataFrame, groupby), plotting calls those of their first data argument
+        rows = _rows(args[0]) if args else None
+        if rows is None and len(args) > 1:
+            rows = _rows(args[1])
+        with span(name, category, rows=rows):
+            return fn(*args, **kwargs)
+    traced.__traced__ = fn
+    return traced
+
+
+# PATCHING -------------------------------------------------------------------------------------------------------------
+
+def enable(memory=False, targets=TARGETS):
+    # Wrap the target callables; memory=True also records allocations (tracemalloc, slows everything down)
+    import importlib
+
+    global _memory
+    if _patched:
+        return
+    for module_name, path, category in targets:
+        try:
+            owner = importlib.import_module(module_name)
+        except ImportError:
+            continue
+        *parents, attribute = path.split('.')
+        for parent in parents:
+            owner = getattr(owner, parent)
+        original = getattr(owner, attribute, None)
+        if original is None or hasattr(original, '__traced__'):
+            continue
+        # Inherited methods (Figure.colorbar) are wrapped on the subclass and simply removed again by disable()
+        own = attribute in vars(owner)
+        setattr(owner, attribute, _wrap(original, path, category))
+        _patched.append((owner, attribute, original, own))
+
+    _memory = memory
+    if memory and not tracemalloc.is_tracing():
+        tracemalloc.start()
+
+
+def disable():
+    global _memory
+    while _patched:
+        owner, attribute, original, own = _patched.pop()
+        if own:
+            setattr(owner, attribute, original)
+        else:
+            delattr(owner, attribute)
+    if _memory:
+        tracemalloc.stop()
+    _memory = False
+
+
+# OUTPUT ---------------------------------------------------------------------------------------------------------------
+
+def collect():
+    # Take the spans recorded so far (in this process)
+    events = list(_events)
+    _events.clear()
+    return events
+
+
+def write(path, events=None):
+    events = collect() if events is None else events
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        if path.endswith('.jsonl'):
+            for event in events:
+                f.write(json.dumps({'name': event['name'], 'category': event['cat'], 'start_us': event['ts'],
+                                    'duration_us': event['dur'], 'pid': event['pid'], **event['args']}) + '\n')
+        else:
+            json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, f)
+    return len(events)
+
+
+def summary(events):
+    # Total time per (figure, span name), slowest first
+    totals = {}
+    for event in events:
+        if event['cat'] == 'figure':
+            continue
+        key = (event['args']['figure'], event['name'])
+        totals[key] = totals.get(key, 0) + event['dur'] / 1e6
+    return sorted(totals.items(), key=lambda item: -item[1])
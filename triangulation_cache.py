@@ -0,0 +1,183 @@
+import hashlib
+import os
+
+import numpy as np
+from matplotlib.collections import TriMesh
+from matplotlib.tri import Triangulation
+
+# Delaunay mesh of the TRIP COLOR stations, computed once and reused for every frame.
+# The triangles are kept in .cache/triangulations as .npz, keyed by a hash of the station coordinates (the least
+# recently used meshes are evicted above MAX_BYTES). New stations inside the mesh are inserted locally (Bowyer-Watson:
+# only the triangles whose circumcircle contains the new station are replaced; a station on a hull edge adds no flat
+# triangle and a duplicate station stays out of the mesh); a station outside the current hull triggers a full Delaunay
+# run. Each frame then only sets new z values on the existing artist (StationMesh.update_values).
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+CACHE_DIR = os.path.join(ROOT, '.cache', 'triangulations')
+MAX_BYTES = 256 * 1024 * 1024
+
+
+def _doubled_area(x, y, triangles):
+    # Twice the signed area of every triangle: positive for anticlockwise corners, zero for collinear ones
+    a, b, c = triangles.T
+    return (x[b] - x[a]) * (y[c] - y[a]) - (x[c] - x[a]) * (y[b] - y[a])
+
+
+def _anticlockwise(x, y, triangles):
+    area = _doubled_area(x, y, triangles)
+    triangles = triangles.copy()
+    triangles[area < 0] = triangles[area < 0][:, [0, 2, 1]]
+    return triangles
+
+
+class StationMesh:
+
+    def __init__(self, x, y, triangles=None):
+        self.x = np.asarray(x, dtype=float)
+        self.y = np.asarray(y, dtype=float)
+        if triangles is None:
+            triangles = Triangulation(self.x, self.y).triangles
+        self.triangles = _anticlockwise(self.x, self.y, np.asarray(triangles, dtype=np.int32))
+        self._triangulation = None
+
+    @property
+    def triangulation(self):
+        # matplotlib Triangulation built from the stored triangles (no Delaunay run)
+        if self._triangulation is None:
+            self._triangulation = Triangulation(self.x, self.y, self.triangles)
+        return self._triangulation
+
+    # INCREMENTAL UPDATES ----------------------------------------------------------------------------------------------
+
+    def _insert(self, px, py):
+        # Bowyer-Watson insertion of one point; False when the point lies outside the mesh. A point on a station is
+        # kept without triangles of its own, as Triangulation leaves duplicate points out of the mesh.
+        x, y, triangles = self.x, self.y, self.triangles
+        a, b, c = triangles.T
+        # Coordinates closer than tolerance (relative to the extent of the stations) are treated as equal, triangles
+        # smaller than tolerance * scale as flat
+        scale = max(np.ptp(x), np.ptp(y)) or 1
+        tolerance = 1e-10 * scale
+
+        if ((np.abs(x - px) <= tolerance) & (np.abs(y - py) <= tolerance)).any():
+            self.x = np.append(x, px)
+            self.y = np.append(y, py)
+            return True
+
+        # Outside every triangle (barycentric test) means outside the hull
+        det = (y[b] - y[c]) * (x[a] - x[c]) + (x[c] - x[b]) * (y[a] - y[c])
+        l1 = ((y[b] - y[c]) * (px - x[c]) + (x[c] - x[b]) * (py - y[c])) / det
+        l2 = ((y[c] - y[a]) * (px - x[c]) + (x[a] - x[c]) * (py - y[c])) / det
+        eps = -1e-12
+        if not ((l1 >= eps) & (l2 >= eps) & (1 - l1 - l2 >= eps)).any():
+            return False
+
+        # Triangles whose circumcircle contains the point (in-circle determinant, anticlockwise triangles)
+        ax_, ay_ = x[a] - px, y[a] - py
+        bx_, by_ = x[b] - px, y[b] - py
+        cx_, cy_ = x[c] - px, y[c] - py
+        incircle = ((ax_ * ax_ + ay_ * ay_) * (bx_ * cy_ - cx_ * by_)
+                    - (bx_ * bx_ + by_ * by_) * (ax_ * cy_ - cx_ * ay_)
+                    + (cx_ * cx_ + cy_ * cy_) * (ax_ * by_ - bx_ * ay_))
+        bad = incircle > 0
+
+        # The cavity boundary is made of the edges used by a single removed triangle
+        edges = triangles[bad][:, [0, 1, 1, 2, 2, 0]].reshape(-1, 2)
+        undirected = np.sort(edges, axis=1)
+        _, inverse, counts = np.unique(undirected, axis=0, return_inverse=True, return_counts=True)
+        boundary = edges[counts[inverse.ravel()] == 1]
+
+        new = len(x)
+        px_, py_ = np.append(x, px), np.append(y, py)
+        fan = np.column_stack([boundary, np.full(len(boundary), new)]).astype(np.int32)
+
+        # A clockwise fan triangle means the point is outside the hull after all (within the tolerance of the
+        # barycentric test); a collinear one means it lies on a hull edge, which then needs no triangle
+        area = _doubled_area(px_, py_, fan)
+        if (area < -tolerance * scale).any():
+            return False
+        self.x, self.y = px_, py_
+        self.triangles = np.concatenate([triangles[~bad], fan[area > tolerance * scale]])
+        return True
+
+    def add_stations(self, x_new, y_new):
+        # Add stations to the mesh; returns the number of stations that were inserted incrementally
+        x_new = np.atleast_1d(np.asarray(x_new, dtype=float))
+        y_new = np.atleast_1d(np.asarray(y_new, dtype=float))
+        self._triangulation = None
+
+        inserted = 0
+        for px, py in zip(x_new, y_new):
+            if not self._insert(px, py):
+                break
+            inserted += 1
+
+        if inserted < len(x_new):
+            # A station outside the hull changes the boundary: triangulate everything again
+            self.x = np.append(self.x, x_new[inserted:])
+            self.y = np.append(self.y, y_new[inserted:])
+            self.triangles = _anticlockwise(self.x, self.y, Triangulation(self.x, self.y).triangles)
+        return inserted
+
+    def update_values(self, collection, z):
+        # Next frame of a tripcolor plot of this mesh: only the colours change
+        z = np.asarray(z)
+        if isinstance(collection, TriMesh):
+            collection.set_array(z)
+        else:
+            # Flat shading colours each triangle with the mean of its corners
+            collection.set_array(z[self.triangles].mean(axis=1))
+        return collection
+
+    # PERSISTENCE ------------------------------------------------------------------------------------------------------
+
+    def save(self, path):
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        np.savez(path, x=self.x, y=self.y, triangles=self.triangles)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as saved:
+            return cls(saved['x'], saved['y'], saved['triangles'])
+
+
+def _cache_path(x, y, cache_dir):
+    digest = hashlib.sha256(np.ascontiguousarray(x, dtype=float).tobytes())
+    digest.update(np.ascontiguousarray(y, dtype=float).tobytes())
+    return os.path.join(cache_dir, digest.hexdigest() + '.npz')
+
+
+def _store(mesh, cache_dir):
+    from render_cache import evict
+
+    mesh.save(_cache_path(mesh.x, mesh.y, cache_dir))
+    evict(cache_dir, MAX_BYTES)
+
+
+def cached_mesh(x, y, cache_dir=None):
+    # StationMesh of the stations, loaded from the cache (CACHE_DIR unless cache_dir is given) when these coordinates
+    # were triangulated before
+    cache_dir = cache_dir or CACHE_DIR
+    path = _cache_path(x, y, cache_dir)
+    if os.path.exists(path):
+        # Mark as recently used (the cache is evicted least recently used first)
+        os.utime(path)
+        return StationMesh.load(path)
+    mesh = StationMesh(x, y)
+    _store(mesh, cache_dir)
+    return mesh
+
+
+def add_stations(x, y, x_new, y_new, cache_dir=None):
+    # Mesh of the stations plus the new ones, derived from the cached mesh and cached in turn
+    cache_dir = cache_dir or CACHE_DIR
+    mesh = cached_mesh(x, y, cache_dir)
+    mesh.add_stations(x_new, y_new)
+    _store(mesh, cache_dir)
+    return mesh
+
+
+def clear(cache_dir=None):
+    # Remove every cached mesh
+    import render_cache
+    render_cache.clear(cache_dir or CACHE_DIR)
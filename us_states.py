@@ -0,0 +1,80 @@
+import os
+
+import geopandas as gpd
+import pandas as pd
+
+# Local store of the US-states geometry used by the choropleth in lesson_2.py.
+# The GeoJSON is downloaded and parsed once, then kept as GeoParquet (or a pickle when pyarrow is not installed) under
+# .cache/geometry, together with simplified copies at the tolerances below. Later runs read the binary file and work
+# offline; within a process every tolerance is only read once.
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+URL = 'https://github.com/PublicaMundi/MappingAPI/raw/master/data/geojson/us-states.json'
+CACHE_DIR = os.path.join(ROOT, '.cache', 'geometry')
+
+# Simplification tolerances in degrees: full resolution, print, screen, thumbnail
+TOLERANCES = (0.0, 0.01, 0.05, 0.1)
+
+try:
+    import pyarrow  # noqa: F401  (needed by GeoDataFrame.to_parquet)
+    FORMAT = 'parquet'
+except ImportError:
+    FORMAT = 'pickle'
+
+_loaded = {}
+
+
+def _cache_path(tolerance, cache_dir):
+    return os.path.join(cache_dir, f'us_states_{tolerance:g}.{FORMAT}')
+
+
+def _read(path):
+    if FORMAT == 'parquet':
+        return gpd.read_parquet(path)
+    return pd.read_pickle(path)
+
+
+def _write(states, path):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    if FORMAT == 'parquet':
+        states.to_parquet(path)
+    else:
+        states.to_pickle(path)
+
+
+def build(source=URL, cache_dir=CACHE_DIR, tolerances=TOLERANCES):
+    # Parse the GeoJSON once and write the full and the simplified geometries to the cache
+    states = gpd.read_file(source)
+    for tolerance in tolerances:
+        simplified = states
+        if tolerance > 0:
+            simplified = states.copy()
+            simplified['geometry'] = states.geometry.simplify(tolerance, preserve_topology=True)
+        _write(simplified, _cache_path(tolerance, cache_dir))
+        _loaded[(tolerance, cache_dir)] = simplified
+    return _loaded[(0.0, cache_dir)] if 0.0 in tolerances else states
+
+
+def load_states(tolerance=0.0, source=URL, cache_dir=CACHE_DIR):
+    # The returned GeoDataFrame is shared between callers: copy it before adding columns
+    key = (tolerance, cache_dir)
+    if key in _loaded:
+        return _loaded[key]
+
+    path = _cache_path(tolerance, cache_dir)
+    if not os.path.exists(path):
+        build(source, cache_dir, tolerances=sorted(set(TOLERANCES) | {tolerance}))
+        return _loaded[key]
+
+    _loaded[key] = _read(path)
+    return _loaded[key]
+
+
+if __name__ == '__main__':
+    # Prefetch (or refresh) the geometry so that the lesson scripts can run offline
+    import sys
+
+    build(sys.argv[1] if len(sys.argv) > 1 else URL)
+    for tolerance in TOLERANCES:
+        path = _cache_path(tolerance, CACHE_DIR)
+        print(f'{path}: {os.path.getsize(path) / 1024:.0f} KiB')